@@ -12,6 +12,7 @@ import cv2
 import numpy as np
 import streamlit as st
 from counters import SitupCounter, JumpCounter
+from webcam import WEBCAM_UI_FPS, WebcamSession
 
 
 st.set_page_config(page_title="Fitness Counter", layout="wide")
@@ -36,6 +37,7 @@ def main():
         with col2:
             st.subheader("Live Count")
             count_box = st.empty()
+            stats_box = st.empty()
 
         if "cam_running" not in st.session_state:
             st.session_state.cam_running = False
@@ -44,26 +46,47 @@ def main():
         if stop_cam:
             st.session_state.cam_running = False
 
+        # The session (camera, counter, worker threads) outlives reruns; it is
+        # only rebuilt when stopped, when the activity changes or after it ended.
+        session = st.session_state.get("webcam")
+        if session is not None and (not st.session_state.cam_running or session.kind != kind or not session.running):
+            session.stop()
+            del st.session_state["webcam"]
+            session = None
+
         if st.session_state.cam_running:
-            counter = SitupCounter() if kind == "situp" else JumpCounter()
-            cap = cv2.VideoCapture(0)
-            if not cap.isOpened():
-                st.error("Could not open webcam 0. Try another index.")
-            else:
+            if session is None:
+                session = WebcamSession(kind)
                 try:
-                    while st.session_state.cam_running:
-                        ok, frame = cap.read()
-                        if not ok:
-                            st.warning("Webcam frame not read. Stopping.")
-                            break
-                        frame, info = counter.process_frame(frame)
-                        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                        frame_box.image(frame_rgb, caption=f"Count: {info.get('count', 0)}", use_column_width=True)
-                        count_box.metric("Count", int(info.get("count", 0)))
-                        time.sleep(0.01) # A small sleep to prevent high CPU usage
-                finally:
-                    cap.release()
-                    counter.close()
+                    session.start()
+                except RuntimeError as e:
+                    st.error(str(e))
+                    st.session_state.cam_running = False
+                    session = None
+                else:
+                    st.session_state.webcam = session
+            # Redraw at most WEBCAM_UI_FPS times a second, whatever the processing rate.
+            interval = 1.0 / WEBCAM_UI_FPS
+            shown = 0
+            while session is not None and session.running:
+                tick = time.perf_counter()
+                seq, result = session.poll(shown, timeout=0.5)
+                if result is not None:
+                    shown = seq
+                    frame, info = result
+                    frame_box.image(frame, channels="BGR", caption=f"Count: {info.get('count', 0)}", use_column_width=True)
+                    count_box.metric("Count", int(info.get("count", 0)))
+                    stats = session.stats()
+                    stats_box.caption(
+                        f"Processing {stats['processing_fps'] or 0:.1f} fps · "
+                        f"latency {stats['latency_ms'] or 0:.0f} ms · "
+                        f"camera {stats['camera_fps'] or 0:.1f} fps · "
+                        f"{stats['dropped']} frames skipped"
+                    )
+                time.sleep(max(0.0, interval - (time.perf_counter() - tick)))
+            if session is not None and session.error:
+                st.warning(session.error)
+                st.session_state.cam_running = False
 
     elif input_mode == "Upload video (local)":
         with col1:
@@ -94,9 +117,8 @@ def main():
                         ok, frame = cap.read()
                         if not ok:
                             break
-                        frame, info = counter.process_frame(frame)
-                        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                        frame_placeholder.image(frame_rgb, caption=f"Count: {info.get('count', 0)}", use_column_width=True)
+                        frame, info = counter.process_frame(frame, out=frame)
+                        frame_placeholder.image(frame, channels="BGR", caption=f"Count: {info.get('count', 0)}", use_column_width=True)
                         live_count.metric(label="Live Count", value=int(info.get("count", 0)))
                         time.sleep(0.01) # A small sleep to mimic video frame rate
                     result_box.success("Processing Done.")
@@ -0,0 +1,16 @@
+# benchmarks
+# Reproducible performance measurements for the counters and the API.
+#
+# Inputs are generated locally from fixed seeds (landmark traces and short
+# rendered videos), so runs on the same machine are comparable over time.
+#
+# Suites (select with --suites, all by default):
+#   micro      counter building blocks (stages.py)
+#   batch      streaming counters vs rep_analysis on one trace (batch_analysis.py)
+#   stages     process_frame timed stage by stage (stages.py)
+#   overlay    colour conversion and overlay at 1080p (overlay.py)
+#   endpoints  /predict_* latency through the real app (endpoints.py)
+#
+# Run from the fitness_app directory:
+#   python -m benchmarks --output baseline.json
+#   python -m benchmarks --compare baseline.json
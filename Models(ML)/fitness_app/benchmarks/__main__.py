@@ -0,0 +1,133 @@
+# benchmarks/__main__.py
+# Runs the benchmark suites and writes or compares a JSON baseline.
+#
+# Usage (from the fitness_app directory):
+#   python -m benchmarks --output baseline.json
+#   python -m benchmarks --compare baseline.json --tolerance 0.15
+#   python -m benchmarks --suites micro,stages --frames 300
+#   python -m benchmarks --suites overlay --overlay-size 1920x1080
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+SUITES = ("micro", "batch", "stages", "overlay", "endpoints")
+KINDS = ("situp", "jump")
+
+
+def _environment() -> dict:
+    import mediapipe as mp
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "mediapipe": mp.__version__,
+    }
+
+
+def run(suites, frames: int, requests: int, render: bool, seed: int, overlay_size=(1920, 1080)) -> dict:
+    from benchmarks import batch_analysis, endpoints, overlay, stages
+    from benchmarks.synthetic import make_video
+
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    try:
+        if "micro" in suites:
+            results.update(stages.bench_micro(seed=seed))
+        if "batch" in suites:
+            results.update(batch_analysis.run(frames=frames, seed=seed))
+        for kind in KINDS:
+            if "stages" in suites:
+                clip = make_video(os.path.join(workdir, f"stages-{kind}.mp4"), kind, frames, seed)
+                results.update(stages.bench_stages(kind, clip))
+            if "overlay" in suites:
+                clip = make_video(os.path.join(workdir, f"overlay-{kind}.mp4"), kind, frames, seed, size=overlay_size)
+                results.update(overlay.bench_overlay(kind, clip))
+            if "endpoints" in suites:
+                results.update(endpoints.bench_predict(kind, workdir, requests, frames, render, seed))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(baseline: dict, results: dict, tolerance: float):
+    """Print p50 changes against the baseline; return the names that got slower."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"  new       {name}: p50 {current['p50_ms']:.4f} ms")
+            continue
+        ratio = current["p50_ms"] / previous["p50_ms"] if previous["p50_ms"] else float("inf")
+        flag = "SLOWER" if ratio > 1 + tolerance else "faster" if ratio < 1 - tolerance else "same"
+        if flag == "SLOWER":
+            regressions.append(name)
+        print(f"  {flag:9} {name}: p50 {previous['p50_ms']:.4f} -> {current['p50_ms']:.4f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the counters and the prediction endpoints.")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"comma-separated subset of {', '.join(SUITES)}")
+    parser.add_argument("--frames", type=int, default=150, help="frames per synthetic clip and landmark trace")
+    parser.add_argument("--requests", type=int, default=5, help="measured requests per endpoint and outcome")
+    parser.add_argument("--no-render", dest="render", action="store_false", help="stats-only endpoint requests")
+    parser.add_argument("--overlay-size", default="1920x1080", help="WIDTHxHEIGHT of the overlay suite's clip")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as a JSON baseline to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare against; exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed p50 slowdown (default 0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+    try:
+        overlay_size = tuple(int(v) for v in args.overlay_size.lower().split("x"))
+    except ValueError:
+        overlay_size = ()
+    if len(overlay_size) != 2 or min(overlay_size) <= 0:
+        parser.error(f"bad --overlay-size: {args.overlay_size}")
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    import env_setup  # noqa: F401
+    results = run(suites, args.frames, args.requests, args.render, args.seed, overlay_size)
+    for name, r in results.items():
+        alloc = f"  alloc {r['alloc_kb']:>10.1f} KB" if "alloc_kb" in r else ""
+        print(f"{name:32} {r['per_sec'] or 0:>12.1f} {r['unit']}/s  p50 {r['p50_ms']:>10.4f} ms  p99 {r['p99_ms']:>10.4f} ms{alloc}")
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} ({baseline['environment']['timestamp']}):")
+        regressions = compare(baseline["results"], results, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            status = 1
+    if args.output:
+        report = {
+            "environment": _environment(),
+            "settings": {"suites": suites, "frames": args.frames, "requests": args.requests,
+                         "render": args.render, "seed": args.seed, "overlay_size": list(overlay_size)},
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
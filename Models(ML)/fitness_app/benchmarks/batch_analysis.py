@@ -0,0 +1,75 @@
+# benchmarks/batch_analysis.py
+# Post-inference cost: streaming counters vs the vectorized rep_analysis engine.
+#
+# Both paths get the same deterministic synthetic landmark trace; the streaming
+# counters are fed frame by frame through update(), the batch engine gets the
+# whole (frames, 33, 4) stack. Results must be identical.
+#
+# Usage:
+#   python -m benchmarks.batch_analysis --frames 18000 --repeat 3
+
+import argparse
+import time
+
+import env_setup  # noqa: F401
+import landmarks
+import rep_analysis
+from counters import COUNTERS
+from benchmarks.synthetic import synthetic_trace
+from benchmarks.timing import summarize
+
+FRAME_SHAPE = (720, 1280, 3)
+
+
+def _streaming(kind, results, frame_shape):
+    counter = COUNTERS[kind]()
+    try:
+        info = {}
+        t0 = time.perf_counter()
+        for r in results:
+            info = counter.update(r, frame_shape)
+        return time.perf_counter() - t0, info
+    finally:
+        counter.close()
+
+
+def _batch(kind, trace, frame_height):
+    t0 = time.perf_counter()
+    info = rep_analysis.analyze(kind, trace, frame_height)
+    return time.perf_counter() - t0, info
+
+
+def run(frames: int = 18000, repeat: int = 3, seed: int = 0) -> dict:
+    """Timings of a whole trace per kind and path, and whether the results agree."""
+    report = {}
+    for kind in ("situp", "jump"):
+        trace = synthetic_trace(kind, frames, seed)
+        results = [landmarks.to_results(row) for row in trace]
+        stream = [_streaming(kind, results, FRAME_SHAPE) for _ in range(repeat)]
+        batch = [_batch(kind, trace, FRAME_SHAPE[0]) for _ in range(repeat)]
+        report[f"{kind}.rep_logic.streaming"] = summarize([s for s, _ in stream], unit="frame", per_sample=frames)
+        report[f"{kind}.rep_logic.batch"] = summarize([s for s, _ in batch], unit="frame", per_sample=frames)
+        report[f"{kind}.rep_logic.batch"]["matches_streaming"] = stream[-1][1] == batch[-1][1]
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark streaming vs vectorized rep analysis.")
+    parser.add_argument("--frames", type=int, default=18000, help="frames per trace (default: 10 min at 30 fps)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = run(args.frames, args.repeat, args.seed)
+    for kind in ("situp", "jump"):
+        stream = report[f"{kind}.rep_logic.streaming"]
+        batch = report[f"{kind}.rep_logic.batch"]
+        same = "identical" if batch["matches_streaming"] else "DIFFERENT"
+        print(
+            f"{kind:5}: {args.frames} frames, streaming {stream['p50_ms']:.1f} ms, "
+            f"batch {batch['p50_ms']:.1f} ms, {stream['p50_ms'] / batch['p50_ms']:.1f}x faster, results {same}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/endpoints.py
+# End-to-end latency of /predict_situp and /predict_jump.
+#
+# Requests go through the real app (job queue, worker processes, landmark
+# cache) in-process via TestClient. Every "miss" request uploads a clip no
+# earlier request has used, so pose inference really runs; "hit" requests
+# repeat the first clip and measure the landmark-cache path. One unmeasured
+# request first brings up the worker processes. The clips are checked to show
+# MediaPipe a pose, so the inference path is timed with real detections.
+
+import os
+import time
+
+import cv2
+
+from benchmarks.synthetic import detection_rate, make_video, require_detections
+from benchmarks.timing import summarize
+
+
+def _frames(video_path) -> int:
+    cap = cv2.VideoCapture(video_path)
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+
+
+def _remove_outputs(server, result) -> None:
+    name = result["processed_video_url"].rsplit("/", 1)[-1]
+    for path in (os.path.join(server.PROCESSED_DIR, name),
+                 os.path.join(server.PENDING_DIR, name),
+                 os.path.join(server.PENDING_DIR, name + ".json")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def bench_predict(kind: str, workdir, requests: int = 5, frames: int = 150, render: bool = True, seed: int = 0) -> dict:
+    # A fresh landmark cache, so earlier runs cannot turn misses into hits.
+    # Worker processes are spawned later and inherit it.
+    os.environ["LANDMARK_CACHE_DIR"] = os.path.join(workdir, "landmark_cache")
+    from fastapi.testclient import TestClient
+    import server
+
+    clips = [make_video(os.path.join(workdir, f"{kind}-{seed + i}.mp4"), kind, frames, seed + i) for i in range(requests + 1)]
+    warmup, clips = clips[-1], clips[:-1]
+    detected = require_detections(f"predict_{kind}", detection_rate(clips[0]))
+    per_request = _frames(clips[0])
+    timings = {"warmup": [], "miss": [], "hit": []}
+    with TestClient(server.app) as client:
+        for outcome, paths in (("warmup", [warmup]), ("miss", clips), ("hit", clips[:1] * requests)):
+            for path in paths:
+                with open(path, "rb") as f:
+                    t0 = time.perf_counter()
+                    response = client.post(
+                        f"/predict_{kind}", params={"render": render}, files={"file": ("clip.mp4", f, "video/mp4")},
+                    )
+                    elapsed = time.perf_counter() - t0
+                if response.status_code != 200:
+                    raise RuntimeError(f"/predict_{kind} returned {response.status_code}: {response.text}")
+                _remove_outputs(server, response.json())
+                timings[outcome].append(elapsed)
+    report = {
+        f"predict_{kind}.{outcome}": summarize(samples, unit="frame", per_sample=per_request)
+        for outcome, samples in timings.items() if outcome != "warmup"
+    }
+    report[f"predict_{kind}.miss"]["detected"] = detected
+    return report
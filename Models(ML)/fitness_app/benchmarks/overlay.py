@@ -0,0 +1,162 @@
+# benchmarks/overlay.py
+# Per-frame cost and memory churn of the frame work around pose inference.
+#
+# The colour conversion for MediaPipe and the overlay are run over a 1080p
+# synthetic clip twice, in separate passes so neither evicts the other's
+# arrays from the cache: "reused" is the counters' render path, with reused
+# buffers and the HUD blended only where it is drawn; "legacy" is the path
+# it replaced, which allocated a new RGB copy and output copy per frame and,
+# for jumps, an overlay copy blended over the whole frame. Next to the
+# latency, "alloc_kb" is the peak of new Python/numpy allocations during the
+# call (tracemalloc), i.e. the allocator traffic one frame causes.
+#
+# Afterwards, outside the timings, every frame is rendered both ways and the
+# outputs compared ("matches_legacy"). The clip must show MediaPipe a pose and
+# the comparison must include frames with landmarks, or the suite fails:
+# otherwise only the empty "no pose" overlay would be measured and checked.
+
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import env_setup  # noqa: F401
+from counters import COUNTERS
+from benchmarks.synthetic import require_detections
+from benchmarks.timing import summarize
+
+MODES = ("reused", "legacy")
+
+
+def _legacy_render(counter, frame, results):
+    """The overlay as the counters drew it before they had reusable buffers."""
+    output = frame.copy()
+    if counter.kind == "situp":
+        counter.draw_landmarks(output, results)
+        cv2.putText(output, f"Reps: {counter.counter}", (30, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 3, cv2.LINE_AA)
+        cv2.putText(output, f"Stage: {counter.stage}", (30, 100), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 3, cv2.LINE_AA)
+        return output
+    h, w = frame.shape[:2]
+    overlay = output.copy()
+    cv2.rectangle(overlay, (20, 20), (340, 160), (29, 29, 29), -1)
+    cv2.putText(overlay, 'JUMP COUNT', (40, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2, cv2.LINE_AA)
+    cv2.putText(overlay, str(counter.jump_counter), (45, 125), cv2.FONT_HERSHEY_SIMPLEX, 2.5, (255, 255, 255), 4, cv2.LINE_AA)
+    cv2.putText(overlay, 'LAST JUMP (CM)', (160, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2, cv2.LINE_AA)
+    cv2.putText(overlay, f"{counter.last_jump_height_cm:.1f}", (165, 125), cv2.FONT_HERSHEY_SIMPLEX, 2.5, (255, 255, 255), 4, cv2.LINE_AA)
+    bar_color = (29, 29, 29)
+    text_color = (255, 255, 255)
+    if counter.state == 'JUMPING':
+        bar_color = (0, 255, 0)
+    elif counter.state == 'CALIBRATING':
+        bar_color = (0, 255, 255)
+        text_color = (0, 0, 0)
+    cv2.rectangle(overlay, (20, h - 70), (w - 20, h - 20), bar_color, -1)
+    (text_w, _), _ = cv2.getTextSize(counter.feedback, cv2.FONT_HERSHEY_SIMPLEX, 0.9, 2)
+    cv2.putText(overlay, counter.feedback, (int((w - text_w) / 2), h - 38), cv2.FONT_HERSHEY_SIMPLEX, 0.9, text_color, 2, cv2.LINE_AA)
+    output = cv2.addWeighted(overlay, 0.7, output, 0.3, 0)
+    counter.draw_landmarks(output, results)
+    if counter.calibrated:
+        cv2.line(output, (0, int(counter.crouch_threshold)), (w, int(counter.crouch_threshold)), (0, 0, 255), 2, cv2.LINE_AA)
+    return output
+
+
+def _frame_work(counter, frame, results, mode: str):
+    if mode == "legacy":
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return _legacy_render(counter, frame, results)
+    image = counter.buffer("rgb", frame.shape)
+    image.flags.writeable = True
+    cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=image)
+    return counter.render(frame, results)
+
+
+def _allocated(fn, *args) -> int:
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before
+
+
+def _compare_with_legacy(kind: str, video_path, detected):
+    """Render every frame both ways; (frames compared with a pose, all equal)."""
+    counter = COUNTERS[kind]()
+    with_pose = 0
+    matches = True
+    cap = cv2.VideoCapture(video_path)
+    try:
+        for results in detected:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            counter.update(results, frame.shape)
+            matches = matches and np.array_equal(counter.render(frame, results), _legacy_render(counter, frame, results))
+            with_pose += results.pose_landmarks is not None
+    finally:
+        cap.release()
+        counter.close()
+    return with_pose, matches
+
+
+def bench_overlay(kind: str, video_path, warmup: int = 5) -> dict:
+    """Latency and allocations per frame of colour conversion plus overlay.
+
+    Pose inference runs over the clip once beforehand, so the overlay has
+    real landmarks to draw without MediaPipe's work disturbing the timings.
+    The first `warmup` frames are not measured.
+    """
+    report = {}
+    counter = COUNTERS[kind]()
+    try:
+        detected = []
+        cap = cv2.VideoCapture(video_path)
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                detected.append(counter.detect(frame))
+        finally:
+            cap.release()
+        with_pose = sum(r.pose_landmarks is not None for r in detected)
+        rate = require_detections(f"{kind} overlay", with_pose / len(detected) if detected else 0.0)
+        for mode in MODES:
+            times = []
+            allocs = []
+            cap = cv2.VideoCapture(video_path)
+            frame_idx = 0
+            try:
+                while frame_idx < len(detected):
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    results = detected[frame_idx]
+                    counter.update(results, frame.shape)
+                    t0 = time.perf_counter()
+                    _frame_work(counter, frame, results, mode)
+                    elapsed = time.perf_counter() - t0
+                    allocated = _allocated(_frame_work, counter, frame, results, mode)
+                    if frame_idx >= warmup:
+                        times.append(elapsed)
+                        allocs.append(allocated)
+                    frame_idx += 1
+            finally:
+                cap.release()
+            if not times:
+                raise ValueError(f"{video_path} has no frames after the {warmup} warm-up frames")
+            summary = summarize(times)
+            summary["alloc_kb"] = round(float(np.median(allocs)) / 1024.0, 1)
+            report[f"{kind}.overlay_{height}p.{mode}"] = summary
+        compared, matches = _compare_with_legacy(kind, video_path, detected)
+        if not compared:
+            raise RuntimeError(f"{kind} overlay: no frame with landmarks was compared with the legacy render")
+        reused = report[f"{kind}.overlay_{height}p.reused"]
+        reused.update(detected=rate, compared_with_pose=compared, matches_legacy=matches)
+    finally:
+        counter.close()
+    return report
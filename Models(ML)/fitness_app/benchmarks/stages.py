@@ -0,0 +1,87 @@
+# benchmarks/stages.py
+# Per-stage cost of the frame path and of the counters' building blocks.
+#
+# process_frame is timed piece by piece (colour conversion, pose inference,
+# rep state machine, overlay, encode) on a synthetic clip, so a regression
+# shows up in the stage that caused it instead of only in the total.
+
+import os
+import time
+import tempfile
+
+import cv2
+import numpy as np
+
+import env_setup  # noqa: F401
+from counters import COUNTERS, EMASmoother, calculate_angle
+from benchmarks.synthetic import open_writer, require_detections
+from benchmarks.timing import summarize, time_batches
+
+STAGES = ("color", "inference", "state_machine", "overlay", "encode")
+
+
+def bench_micro(calls: int = 20000, seed: int = 0) -> dict:
+    """calculate_angle and EMASmoother.smooth per call."""
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, 1, (calls, 3, 2)).tolist()
+    values = [(v,) for v in rng.uniform(0, 180, calls).tolist()]
+    ema = EMASmoother(alpha=0.15)
+    return {
+        "calculate_angle": summarize(time_batches(calculate_angle, points), unit="call"),
+        "ema_smooth": summarize(time_batches(ema.smooth, values), unit="call"),
+    }
+
+
+def bench_stages(kind: str, video_path, warmup: int = 10) -> dict:
+    """Per-frame latency of each process_frame stage, plus their sum.
+
+    The first `warmup` frames are run but not measured, since MediaPipe's first
+    inferences include graph initialisation. "detected" on the total is the
+    share of measured frames with a pose; a clip without any fails the suite.
+    """
+    samples = {stage: [] for stage in STAGES}
+    totals = []
+    detected = 0
+    counter = COUNTERS[kind]()
+    counter.acquire_pose()
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    fd, out_path = tempfile.mkstemp(suffix=".mp4")
+    os.close(fd)
+    out = open_writer(out_path, fps, size)
+    frame_idx = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            t0 = time.perf_counter()
+            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            image.flags.writeable = False
+            t1 = time.perf_counter()
+            results = counter.pose.process(image)
+            t2 = time.perf_counter()
+            counter.update(results, frame.shape)
+            t3 = time.perf_counter()
+            output = counter.render(frame, results)
+            t4 = time.perf_counter()
+            out.write(output)
+            t5 = time.perf_counter()
+            if frame_idx >= warmup:
+                for stage, elapsed in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4)):
+                    samples[stage].append(elapsed)
+                totals.append(t5 - t0)
+                detected += results.pose_landmarks is not None
+            frame_idx += 1
+    finally:
+        cap.release()
+        out.release()
+        counter.close()
+        os.remove(out_path)
+    if not totals:
+        raise ValueError(f"{video_path} has no frames after the {warmup} warm-up frames")
+    report = {f"{kind}.{stage}": summarize(samples[stage]) for stage in STAGES}
+    report[f"{kind}.process_frame"] = summarize(totals)
+    report[f"{kind}.process_frame"]["detected"] = require_detections(f"{kind} stages", detected / len(totals))
+    return report
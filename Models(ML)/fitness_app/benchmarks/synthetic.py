@@ -0,0 +1,242 @@
+# benchmarks/synthetic.py
+# Deterministic inputs: landmark traces and short videos rendered from them.
+#
+# The videos show a flat-shaded cartoon person (head with a face, shirt,
+# trousers, arms and shoes) posed from the trace: facing the camera for
+# jumps, side-on on the floor for sit-ups. MediaPipe finds it in almost every
+# jump frame and in most sit-up frames (it loses some lying nearly flat), so
+# the suites time real inference, counting and landmark drawing rather than
+# the "no pose" path; the stick figure used before was never detected.
+# Suites check this with detection_rate() / require_detections().
+
+import math
+
+import cv2
+import numpy as np
+
+import landmarks
+
+SKIN = (150, 180, 225)
+HAIR = (30, 30, 40)
+SHIRT = (160, 60, 40)
+TROUSERS = (70, 50, 40)
+SHOES = (20, 20, 20)
+FEATURES = (40, 30, 30)
+LIPS = (80, 80, 160)
+
+# Standing leg length and standing hip height of the jump figure, in torso
+# lengths and frame heights.
+_LEG = 1.15
+_STANDING_HIP = 0.6
+
+
+def synthetic_trace(kind: str, frames: int, seed: int = 0):
+    """Deterministic landmark stack with periodic reps and 5% dropped frames."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(frames)
+    trace = np.zeros((frames, landmarks.NUM_LANDMARKS, landmarks.NUM_FIELDS), dtype=np.float32)
+    trace[:, :, :2] = rng.uniform(0.3, 0.7, (frames, landmarks.NUM_LANDMARKS, 2))
+    trace[:, :, 3] = rng.uniform(0.5, 1.0, (frames, landmarks.NUM_LANDMARKS))
+    if kind == "situp":
+        angle = np.deg2rad(120 + 60 * np.sin(t / 15.0) + rng.normal(0, 5, frames))
+        for shoulder, hip, knee in ((landmarks.LEFT_SHOULDER, landmarks.LEFT_HIP, landmarks.LEFT_KNEE),
+                                    (landmarks.RIGHT_SHOULDER, landmarks.RIGHT_HIP, landmarks.RIGHT_KNEE)):
+            trace[:, hip, :2] = (0.5, 0.6)
+            trace[:, knee, :2] = (0.7, 0.6)
+            trace[:, shoulder, 0] = 0.5 + 0.2 * np.cos(angle)
+            trace[:, shoulder, 1] = 0.6 - 0.2 * np.sin(angle)
+    else:
+        hip_y = _STANDING_HIP + np.where(t > 70, 0.08 * np.sin(t / 8.0) ** 3, 0) + rng.normal(0, 0.004, frames)
+        trace[:, landmarks.LEFT_HIP, 1] = hip_y
+        trace[:, landmarks.RIGHT_HIP, 1] = hip_y
+        trace[:, landmarks.LEFT_SHOULDER, 1] = hip_y - 0.25
+        trace[:, landmarks.RIGHT_SHOULDER, 1] = hip_y - 0.25
+    trace[rng.uniform(0, 1, frames) < 0.05] = np.nan
+    return trace
+
+
+def open_writer(path, fps: float, size):
+    """VideoWriter with the codec the server uses, or mp4v where H.264 is missing."""
+    for codec in ("avc1", "mp4v"):
+        out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, size)
+        if out.isOpened():
+            return out
+        out.release()
+    raise RuntimeError(f"No usable MP4 encoder for {path}")
+
+
+# --- Figure ---
+def _pt(p):
+    return int(round(p[0])), int(round(p[1]))
+
+
+def _limb(frame, a, b, color, width) -> None:
+    width = max(1, int(width))
+    cv2.line(frame, _pt(a), _pt(b), color, width, cv2.LINE_AA)
+    for p in (a, b):
+        cv2.circle(frame, _pt(p), max(1, width // 2), color, -1, cv2.LINE_AA)
+
+
+def _head(frame, neck, up, size, facing) -> None:
+    """Head on top of `neck`, crown towards the unit vector `up`.
+
+    facing: 0 for a face towards the camera, +1/-1 for a profile looking
+    along the head's right/left.
+    """
+    ux, uy = up
+    rx, ry = -uy, ux
+    center = (neck[0] + ux * size * 1.1, neck[1] + uy * size * 1.1)
+    angle = math.degrees(math.atan2(uy, ux)) + 90
+
+    def at(right, upward):
+        return (center[0] + (rx * right + ux * upward) * size, center[1] + (ry * right + uy * upward) * size)
+
+    thin = max(1, int(size * 0.1))
+    _limb(frame, neck, at(0, -0.7), SKIN, size * 0.7)
+    cv2.ellipse(frame, _pt(center), (int(size * 0.8), int(size)), angle, 0, 360, SKIN, -1, cv2.LINE_AA)
+    cv2.ellipse(frame, _pt(at(0, 0.45)), (int(size * 0.85), int(size * 0.6)), angle, 180, 360, HAIR, -1, cv2.LINE_AA)
+    if facing:
+        cv2.circle(frame, _pt(at(0.45 * facing, 0.1)), max(1, int(size * 0.12)), FEATURES, -1, cv2.LINE_AA)
+        cv2.line(frame, _pt(at(0.75 * facing, 0.0)), _pt(at(0.95 * facing, -0.2)), SKIN, max(1, int(size * 0.2)), cv2.LINE_AA)
+        cv2.line(frame, _pt(at(0.55 * facing, -0.5)), _pt(at(0.75 * facing, -0.45)), LIPS, thin, cv2.LINE_AA)
+        cv2.circle(frame, _pt(at(-0.1 * facing, 0.0)), max(1, int(size * 0.18)), SKIN, -1, cv2.LINE_AA)
+        return
+    for side in (-1, 1):
+        cv2.circle(frame, _pt(at(0.37 * side, 0.05)), max(1, int(size * 0.12)), FEATURES, -1, cv2.LINE_AA)
+        cv2.line(frame, _pt(at(0.2 * side, 0.35)), _pt(at(0.55 * side, 0.37)), HAIR, thin, cv2.LINE_AA)
+        cv2.circle(frame, _pt(at(0.8 * side, 0.0)), max(1, int(size * 0.18)), SKIN, -1, cv2.LINE_AA)
+    cv2.line(frame, _pt(at(0, 0)), _pt(at(-0.08, -0.35)), FEATURES, thin, cv2.LINE_AA)
+    cv2.ellipse(frame, _pt(at(0, -0.6)), (int(size * 0.3), int(size * 0.12)), angle, 0, 180, LIPS, thin, cv2.LINE_AA)
+
+
+def _person(frame, joints, facing: int = 0) -> None:
+    """Draw a person from pixel joint positions ("neck", "pelvis" and, per side
+    "l"/"r", "shoulder", "elbow", "wrist", "hip", "knee", "ankle")."""
+    torso = math.dist(joints["neck"], joints["pelvis"])
+    # In profile the far side is drawn first so the near one covers it.
+    sides = ("l", "r") if facing >= 0 else ("r", "l")
+    for s in sides:
+        toes = facing if facing else (1 if s == "l" else -1)
+        ankle = joints[s + "ankle"]
+        _limb(frame, joints[s + "hip"], joints[s + "knee"], TROUSERS, torso * 0.26)
+        _limb(frame, joints[s + "knee"], ankle, TROUSERS, torso * 0.22)
+        _limb(frame, ankle, (ankle[0] + toes * torso * 0.18, ankle[1] + torso * 0.03), SHOES, torso * 0.12)
+    corners = [joints[k] for k in ("lshoulder", "rshoulder", "rhip", "lhip")]
+    cv2.fillConvexPoly(frame, np.array([_pt(p) for p in corners], np.int32), SHIRT, cv2.LINE_AA)
+    for a, b in zip(corners, corners[1:] + corners[:1]):
+        _limb(frame, a, b, SHIRT, torso * 0.2)
+    for s in sides:
+        _limb(frame, joints[s + "shoulder"], joints[s + "elbow"], SHIRT, torso * 0.17)
+        _limb(frame, joints[s + "elbow"], joints[s + "wrist"], SKIN, torso * 0.13)
+        cv2.circle(frame, _pt(joints[s + "wrist"]), max(1, int(torso * 0.09)), SKIN, -1, cv2.LINE_AA)
+    up = np.subtract(joints["neck"], joints["pelvis"]) / torso
+    _head(frame, joints["neck"], up, torso * 0.28, facing)
+
+
+def _jump_joints(row, w: int, h: int):
+    """Figure facing the camera with the trace's hip and shoulder height.
+
+    Hips below the standing height bend the knees with the feet on the
+    ground; above it, the straight-legged figure is in the air.
+    """
+    hip_y = float(row[landmarks.LEFT_HIP, 1] + row[landmarks.RIGHT_HIP, 1]) / 2.0 * h
+    shoulder_y = float(row[landmarks.LEFT_SHOULDER, 1] + row[landmarks.RIGHT_SHOULDER, 1]) / 2.0 * h
+    torso = hip_y - shoulder_y
+    leg = _LEG * torso
+    ground = _STANDING_HIP * h + leg
+    cx = w / 2.0
+    joints = {"neck": (cx, shoulder_y - 0.08 * torso), "pelvis": (cx, hip_y)}
+    # The subject's left is on the right of the image.
+    for s, side in (("l", 1), ("r", -1)):
+        joints[s + "shoulder"] = (cx + side * 0.42 * torso, shoulder_y)
+        joints[s + "elbow"] = (cx + side * 0.55 * torso, shoulder_y + 0.5 * torso)
+        joints[s + "wrist"] = (cx + side * 0.6 * torso, shoulder_y + 0.95 * torso)
+        joints[s + "hip"] = (cx + side * 0.26 * torso, hip_y)
+        drop = min(leg, ground - hip_y)
+        bend = math.sqrt(max(0.0, (leg / 2) ** 2 - (drop / 2) ** 2))
+        joints[s + "knee"] = (cx + side * (0.27 * torso + bend), hip_y + drop / 2)
+        joints[s + "ankle"] = (cx + side * 0.28 * torso, hip_y + drop)
+    return joints
+
+
+def _situp_joints(row, w: int, h: int):
+    """Side-on figure on the floor with the trace's left shoulder, hip and knee."""
+    def point(i):
+        return np.array([row[i, 0] * w, row[i, 1] * h], dtype=np.float64)
+
+    shoulder, hip, knee = point(landmarks.LEFT_SHOULDER), point(landmarks.LEFT_HIP), point(landmarks.LEFT_KNEE)
+    torso = float(np.linalg.norm(shoulder - hip))
+    along = (shoulder - hip) / torso
+    across = np.array([along[1], -along[0]])
+    thigh = float(np.linalg.norm(knee - hip))
+    ankle = knee + (0.35 * thigh, 0.9 * thigh)
+    joints = {"neck": tuple(hip + 1.08 * torso * along), "pelvis": tuple(hip)}
+    # The far side is offset a little so both arms and legs show.
+    for s, depth in (("l", 0.04), ("r", -0.04)):
+        offset = depth * torso * across
+        reach = knee - shoulder
+        joints[s + "shoulder"] = tuple(shoulder + offset)
+        joints[s + "elbow"] = tuple(shoulder + 0.3 * reach + 0.15 * torso * across + offset)
+        joints[s + "wrist"] = tuple(shoulder + 0.6 * reach + 0.1 * torso * across + offset)
+        joints[s + "hip"] = tuple(hip + offset)
+        joints[s + "knee"] = tuple(knee + offset)
+        joints[s + "ankle"] = tuple(ankle + offset)
+    return joints, 1 if knee[0] > hip[0] else -1
+
+
+def render_frame(kind: str, row, background):
+    """Draw the figure for one landmark row onto a copy of background."""
+    frame = background.copy()
+    if row is None or np.isnan(row[0, 0]):
+        return frame
+    h, w = frame.shape[:2]
+    if kind == "situp":
+        joints, facing = _situp_joints(row, w, h)
+        _person(frame, joints, facing)
+    else:
+        _person(frame, _jump_joints(row, w, h))
+    return frame
+
+
+def make_video(path, kind: str, frames: int = 150, seed: int = 0, size=(640, 480), fps: float = 30.0) -> str:
+    """Write a short clip of the synthetic trace for `kind` to path."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    # Textured background so the encoder has realistic work to do.
+    gradient = np.linspace(40, 160, w, dtype=np.float32)[None, :, None]
+    background = np.clip(gradient + rng.normal(0, 12, (h, w, 3)), 0, 255).astype(np.uint8)
+    out = open_writer(path, fps, size)
+    try:
+        for row in synthetic_trace(kind, frames, seed):
+            out.write(render_frame(kind, row, background))
+    finally:
+        out.release()
+    return path
+
+
+# --- Detection check ---
+def detection_rate(video_path) -> float:
+    """Share of the clip's frames in which MediaPipe finds a pose."""
+    import mediapipe as mp
+    from pose_pool import POSE_OPTIONS
+
+    detected = total = 0
+    cap = cv2.VideoCapture(video_path)
+    try:
+        with mp.solutions.pose.Pose(**POSE_OPTIONS) as pose:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                total += 1
+                detected += pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)).pose_landmarks is not None
+    finally:
+        cap.release()
+    return detected / total if total else 0.0
+
+
+def require_detections(name: str, rate: float) -> float:
+    """Fail a suite whose clip never shows MediaPipe a pose; returns the rate, rounded."""
+    if rate <= 0:
+        raise RuntimeError(f"{name}: no pose detected in any frame, so only the no-pose path would be timed")
+    return round(rate, 3)
@@ -0,0 +1,41 @@
+# benchmarks/timing.py
+# Latency statistics shared by the benchmark suites.
+
+import time
+
+import numpy as np
+
+
+def summarize(samples, unit: str = "frame", per_sample: float = 1.0) -> dict:
+    """Throughput and latency percentiles of per-sample durations in seconds.
+
+    per_sample is how many units one sample covers, e.g. the frames of a
+    video for an end-to-end request.
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    total = float(samples.sum())
+    ms = samples * 1000.0
+    return {
+        "unit": unit,
+        "n": int(len(samples)),
+        "per_sec": round(len(samples) * per_sample / total, 2) if total > 0 else None,
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+    }
+
+
+def time_batches(fn, args, batch: int = 1000) -> list:
+    """Per-call durations of fn over args, measured a batch at a time.
+
+    Calls in the microsecond range would otherwise be dominated by the cost of
+    reading the clock.
+    """
+    samples = []
+    for i in range(0, len(args), batch):
+        chunk = args[i:i + batch]
+        t0 = time.perf_counter()
+        for a in chunk:
+            fn(*a)
+        samples.append((time.perf_counter() - t0) / len(chunk))
+    return samples
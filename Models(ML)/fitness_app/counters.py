@@ -1,10 +1,19 @@
 # counters.py
 
+import time
+
 import cv2
 import mediapipe as mp
 import numpy as np
 from collections import deque
 
+import landmarks
+from metrics import FRAME_STAGE_SECONDS
+from pose_pool import get_pool
+from rep_analysis import (
+    CALIBRATION_FRAMES, HIP_EMA_ALPHA, HIP_HISTORY_FRAMES, LANDING_VELOCITY, TAKE_OFF_VELOCITY, jump_smoothing,
+)
+
 # Corrected EMASmooth    --er class
 class EMASmoother:
     def __init__(self, alpha: float = 0.15) -> None:
@@ -30,16 +39,162 @@ def calculate_angle(a, b, c) -> float:
     return float(angle)
 
 
+def _box(p1, p2, margin: int = 0):
+    """(x0, y0, x1, y1) of the pixels between two corners, x1 and y1 exclusive."""
+    return (min(p1[0], p2[0]) - margin, min(p1[1], p2[1]) - margin,
+            max(p1[0], p2[0]) + 1 + margin, max(p1[1], p2[1]) + 1 + margin)
+
+
+def _text_box(text, org, scale, thickness):
+    (text_w, text_h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+    # Anti-aliased strokes reach a little past the nominal text size.
+    return _box((org[0], org[1] - text_h), (org[0] + text_w, org[1] + baseline), margin=thickness + 2)
+
+
+def _union(boxes, shape):
+    """Box around all of `boxes`, clipped to a frame of `shape`."""
+    h, w = shape[:2]
+    return (max(0, min(b[0] for b in boxes)), max(0, min(b[1] for b in boxes)),
+            min(w, max(b[2] for b in boxes)), min(h, max(b[3] for b in boxes)))
+
+
+def _overlaps(a, b) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
 # Corrected BaseCounter class with __init__
 class BaseCounter:
-    def __init__(self) -> None:
+    def __init__(self, pool=None) -> None:
         self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(min_detection_confidence=0.6, min_tracking_confidence=0.6)
+        # A warm Pose graph is borrowed on the first detect(), so counters fed
+        # landmarks computed elsewhere never hold one.
+        self.pose_pool = pool if pool is not None else get_pool()
+        self.pose_lease = None
+        self.pose = None
         self.mp_drawing = mp.solutions.drawing_utils
+        # Frame-sized working arrays, reused from frame to frame (see buffer()).
+        self.buffers = {}
+        self.frame_step = 1
+
+    def buffer(self, name: str, shape):
+        """Reusable uint8 array of `shape`; only reallocated when the frame size changes."""
+        array = self.buffers.get(name)
+        if array is None or array.shape != tuple(shape):
+            array = self.buffers[name] = np.empty(shape, dtype=np.uint8)
+        return array
+
+    def acquire_pose(self):
+        if self.pose_lease is None:
+            self.pose_lease = self.pose_pool.acquire()
+            self.pose = self.pose_lease.pose
+        return self.pose_lease
 
     def close(self) -> None:
-        if hasattr(self, 'pose') and self.pose:
-            self.pose.close()
+        if getattr(self, 'pose_lease', None) is not None:
+            self.pose_pool.release(self.pose_lease)
+            self.pose_lease = None
+            self.pose = None
+
+    # Pickling carries the rep state only, so a snapshot can continue counting
+    # (or rendering) in another process with that process's own Pose pool.
+    _UNPICKLED = ("mp_pose", "mp_drawing", "pose_pool", "pose_lease", "pose", "buffers")
+
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if k not in self._UNPICKLED}
+
+    def __setstate__(self, state) -> None:
+        BaseCounter.__init__(self)
+        self.__dict__.update(state)
+
+    def detect(self, frame, max_dim=None, pose=None):
+        """Run pose inference on a BGR frame.
+
+        If max_dim is set, frames whose longer side exceeds it are downscaled
+        first. MediaPipe landmarks are normalised to the image, so they map
+        straight back onto the source frame. `pose` runs the inference on an
+        engine owned by the caller instead of one borrowed by the counter.
+
+        The downscaled frame and the RGB copy MediaPipe needs are written into
+        the counter's reused buffers, so no frame-sized array is allocated.
+        """
+        h, w = frame.shape[:2]
+        if max_dim and max(h, w) > max_dim:
+            scale = max_dim / float(max(h, w))
+            size = (max(1, int(w * scale)), max(1, int(h * scale)))
+            resized = self.buffer("resized", (size[1], size[0], 3))
+            frame = cv2.resize(frame, size, dst=resized, interpolation=cv2.INTER_AREA)
+        image = self.buffer("rgb", frame.shape[:2] + (3,))
+        image.flags.writeable = True
+        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=image)
+        image.flags.writeable = False
+        if pose is None:
+            self.acquire_pose()
+            pose = self.pose
+        return pose.process(image)
+
+    def process_frame(self, frame, render: bool = True, max_dim=None, pose=None, out=None):
+        """Run pose inference and the rep logic on one BGR frame.
+
+        With render=False no overlay is drawn and the returned frame is None,
+        which is all a stats-only caller needs. `out` is passed on to render().
+        """
+        t0 = time.perf_counter()
+        results = self.detect(frame, max_dim, pose)
+        t1 = time.perf_counter()
+        info = self.update(results, frame.shape)
+        t2 = time.perf_counter()
+        FRAME_STAGE_SECONDS.observe(t1 - t0, stage="inference")
+        FRAME_STAGE_SECONDS.observe(t2 - t1, stage="counting")
+        if not render:
+            return None, info
+        output = self.render(frame, results, out)
+        FRAME_STAGE_SECONDS.observe(time.perf_counter() - t2, stage="overlay")
+        return output, info
+
+    def update(self, results, frame_shape):
+        """Advance the rep logic with one MediaPipe result."""
+        return self.update_landmarks(landmarks.to_array(results), frame_shape)
+
+    def update_landmarks(self, row, frame_shape):
+        """Advance the rep logic with one (33, 4) landmark row, or None if no pose.
+
+        Only the landmarks are needed, so this also serves clients that run
+        pose estimation on the device. frame_shape starts with the height in
+        pixels of the image the landmarks are normalised to.
+        """
+        raise NotImplementedError
+
+    def set_frame_step(self, step: int) -> None:
+        """Declare that update() sees every `step`-th source frame.
+
+        Called before the first update() when a video is sub-sampled at a fixed
+        rate, so counters that count frames can keep to source-frame timing.
+        Live sessions, whose rate varies, call it again whenever it changes.
+        """
+        self.frame_step = max(1, int(step))
+
+    def near_transition(self) -> bool:
+        """Whether the rep state machine is close to changing state.
+
+        Frame sub-sampling uses this to go back to full rate when it matters.
+        """
+        return True
+
+    def render(self, frame, results, out=None):
+        """Draw the overlay for `results` on a copy of `frame` and return it.
+
+        The copy goes into `out` if given (out=frame draws in place, for callers
+        that own the frame), else into a buffer of the counter that the next
+        render() overwrites, so a caller that keeps frames must pass `out`.
+        """
+        raise NotImplementedError
+
+    def _output(self, frame, out):
+        if out is None:
+            out = self.buffer("output", frame.shape)
+        if out is not frame:
+            np.copyto(out, frame)
+        return out
 
     def draw_landmarks(self, frame, results) -> None:
         if results.pose_landmarks:
@@ -52,87 +207,68 @@ class BaseCounter:
 
 # Unchanged SitupCounter class
 class SitupCounter(BaseCounter):
-    def __init__(self) -> None:
-        super().__init__()
+    kind = "situp"
+
+    def __init__(self, pool=None) -> None:
+        super().__init__(pool)
         self.counter = 0
         self.stage = "up"
         self.ema = EMASmoother(alpha=0.15)
 
     @staticmethod
-    def _best_side_landmarks(landmarks, mp_pose):
-        left_vis = np.mean([
-            landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].visibility,
-            landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].visibility,
-            landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].visibility,
-        ])
-        right_vis = np.mean([
-            landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].visibility,
-            landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value].visibility,
-            landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value].visibility,
-        ])
-        min_vis = 0.3
-        if left_vis >= right_vis and left_vis > min_vis:
-            return (
-                [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x, landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y],
-                [landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].x, landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].y],
-                [landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].x, landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].y],
-            )
-        if right_vis > min_vis:
-            return (
-                [landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].x, landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].y],
-                [landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value].x, landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value].y],
-                [landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value].x, landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value].y],
-            )
-        if left_vis >= right_vis:
-            return (
-                [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x, landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y],
-                [landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].x, landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].y],
-                [landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].x, landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].y],
-            )
-        return (
-            [landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].x, landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].y],
-            [landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value].x, landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value].y],
-            [landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value].x, landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value].y],
+    def _best_side_landmarks(row):
+        sides = (
+            (landmarks.LEFT_SHOULDER, landmarks.LEFT_HIP, landmarks.LEFT_KNEE),
+            (landmarks.RIGHT_SHOULDER, landmarks.RIGHT_HIP, landmarks.RIGHT_KNEE),
         )
+        left_vis, right_vis = (np.mean([row[i][3] for i in side]) for side in sides)
+        # The more visible side, left on ties.
+        side = sides[0] if left_vis >= right_vis else sides[1]
+        return tuple([row[i][0], row[i][1]] for i in side)
 
-    def process_frame(self, frame):
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image.flags.writeable = False
-        results = self.pose.process(image)
-        image.flags.writeable = True
-        output = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-
+    def update_landmarks(self, row, frame_shape):
         angle = None
-        if results.pose_landmarks:
-            lm = results.pose_landmarks.landmark
-            sel = self._best_side_landmarks(lm, self.mp_pose)
-            if sel:
-                shoulder, hip, knee = sel
-                angle = calculate_angle(shoulder, hip, knee)
-                s_angle = self.ema.smooth(angle)
-                if s_angle < 90:
-                    if self.stage == "up":
-                        self.stage = "down"
-                if s_angle > 150:
-                    if self.stage == "down":
-                        self.counter += 1
-                        self.stage = "up"
+        if row is not None and not np.isnan(row[0, 0]):
+            # Plain Python floats, the same values MediaPipe's landmark fields give.
+            shoulder, hip, knee = self._best_side_landmarks(row.tolist())
+            angle = calculate_angle(shoulder, hip, knee)
+            s_angle = self.ema.smooth(angle)
+            if s_angle < 90:
+                if self.stage == "up":
+                    self.stage = "down"
+            if s_angle > 150:
+                if self.stage == "down":
+                    self.counter += 1
+                    self.stage = "up"
+        return {"count": self.counter, "stage": self.stage, "angle": angle}
+
+    def near_transition(self, margin: float = 20.0) -> bool:
+        s_angle = self.ema.smoothed_value
+        if s_angle is None:
+            return True
+        if self.stage == "up":
+            return s_angle < 90 + margin
+        return s_angle > 150 - margin
 
+    def render(self, frame, results, out=None):
+        output = self._output(frame, out)
         self.draw_landmarks(output, results)
         cv2.putText(output, f"Reps: {self.counter}", (30, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 3, cv2.LINE_AA)
         cv2.putText(output, f"Stage: {self.stage}", (30, 100), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 3, cv2.LINE_AA)
-        return output, {"count": self.counter, "stage": self.stage, "angle": angle}
+        return output
 
 
 # Corrected JumpCounter class with __init__
 class JumpCounter(BaseCounter):
-    def __init__(self) -> None:
-        super().__init__()
+    kind = "jump"
+
+    def __init__(self, pool=None) -> None:
+        super().__init__(pool)
         self.jump_counter = 0
         self.state = "CALIBRATING"
         self.feedback = "Stand Still for Calibration"
         self.calibrated = False
-        self.calibration_frames = 60
+        self.calibration_frames = CALIBRATION_FRAMES
         self.calib_hip = []
         self.calib_shoulder = []
         self.standing_y_hip = 0.0
@@ -140,80 +276,97 @@ class JumpCounter(BaseCounter):
         self.pixels_to_cm_ratio = 1.0
         self.current_jump_peak = 0.0
         self.last_jump_height_cm = 0.0
-        self.hip_y_history = deque(maxlen=5)
+        self.hip_y_history = deque(maxlen=HIP_HISTORY_FRAMES)
         self.previous_hip_y = 0.0
-        self.hip_ema = EMASmoother(alpha=0.4)
+        self.hip_ema = EMASmoother(alpha=HIP_EMA_ALPHA)
 
-    def process_frame(self, frame):
-        h, w, _ = frame.shape
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image.flags.writeable = False
-        results = self.pose.process(image)
-        image.flags.writeable = True
-        output = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-
-        try:
-            landmarks = results.pose_landmarks.landmark
-            left_hip = landmarks[self.mp_pose.PoseLandmark.LEFT_HIP.value]
-            right_hip = landmarks[self.mp_pose.PoseLandmark.RIGHT_HIP.value]
-            left_shoulder = landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-            right_shoulder = landmarks[self.mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-
-            hip_y_raw = ((left_hip.y + right_hip.y) / 2.0) * h
-            shoulder_y_raw = ((left_shoulder.y + right_shoulder.y) / 2.0) * h
-
-            self.hip_y_history.append(hip_y_raw)
-            hip_y = float(np.mean(self.hip_y_history))
-
-            if self.calibration_frames > 0:
-                self.state = "CALIBRATING"
-                self.feedback = f"Stand Still for Calibration ({self.calibration_frames // 30}s)"
-                self.calib_hip.append(hip_y)
-                self.calib_shoulder.append(shoulder_y_raw)
-                self.calibration_frames -= 1
-            elif not self.calibrated:
-                self.standing_y_hip = float(np.mean(self.calib_hip)) if self.calib_hip else hip_y
-                standing_y_shoulder = float(np.mean(self.calib_shoulder)) if self.calib_shoulder else shoulder_y_raw
-                torso_height_pixels = abs(self.standing_y_hip - standing_y_shoulder)
-                if torso_height_pixels > 0:
-                    self.pixels_to_cm_ratio = 50.0 / torso_height_pixels
-                self.crouch_threshold = self.standing_y_hip + (10.0 / self.pixels_to_cm_ratio)
-                self.calibrated = True
-                self.state = "IDLE"
-                self.feedback = "Calibration Complete! Ready to Jump."
-                self.previous_hip_y = self.standing_y_hip
-
-            if self.calibrated:
-                hip_smoothed = self.hip_ema.smooth(hip_y)
-                velocity = hip_smoothed - self.previous_hip_y
-                self.previous_hip_y = hip_y
-                if self.state == "IDLE":
-                    if hip_y > self.crouch_threshold:
-                        self.state = "CROUCHING"
-                        self.feedback = "Crouching..."
-                elif self.state == "CROUCHING":
-                    if velocity < -2.0:
-                        self.state = "JUMPING"
-                        self.feedback = "JUMP!"
-                        self.current_jump_peak = hip_y
-                elif self.state == "JUMPING":
-                    self.current_jump_peak = min(self.current_jump_peak, hip_y)
-                    if velocity > 0.5:
-                        jump_height_pixels = self.standing_y_hip - self.current_jump_peak
-                        self.last_jump_height_cm = jump_height_pixels * self.pixels_to_cm_ratio
-                        self.jump_counter += 1
-                        self.state = "IDLE"
-                        self.feedback = "Nice jump!"
-        except Exception:
+    def update_landmarks(self, row, frame_shape):
+        h = frame_shape[0]
+        if row is None or np.isnan(row[0, 0]):
             self.feedback = "Body not visible. Please step back."
+            return self._info()
+
+        lm = row.tolist()
+        left_hip, right_hip = lm[landmarks.LEFT_HIP], lm[landmarks.RIGHT_HIP]
+        left_shoulder, right_shoulder = lm[landmarks.LEFT_SHOULDER], lm[landmarks.RIGHT_SHOULDER]
+
+        hip_y_raw = ((left_hip[1] + right_hip[1]) / 2.0) * h
+        shoulder_y_raw = ((left_shoulder[1] + right_shoulder[1]) / 2.0) * h
+
+        self.hip_y_history.append(hip_y_raw)
+        hip_y = float(np.mean(self.hip_y_history))
 
-        overlay = output.copy()
+        if self.calibration_frames > 0:
+            self.state = "CALIBRATING"
+            self.feedback = f"Stand Still for Calibration ({self.calibration_frames * self.frame_step // 30}s)"
+            self.calib_hip.append(hip_y)
+            self.calib_shoulder.append(shoulder_y_raw)
+            self.calibration_frames -= 1
+        elif not self.calibrated:
+            self.standing_y_hip = float(np.mean(self.calib_hip)) if self.calib_hip else hip_y
+            standing_y_shoulder = float(np.mean(self.calib_shoulder)) if self.calib_shoulder else shoulder_y_raw
+            torso_height_pixels = abs(self.standing_y_hip - standing_y_shoulder)
+            if torso_height_pixels > 0:
+                self.pixels_to_cm_ratio = 50.0 / torso_height_pixels
+            self.crouch_threshold = self.standing_y_hip + (10.0 / self.pixels_to_cm_ratio)
+            self.calibrated = True
+            self.state = "IDLE"
+            self.feedback = "Calibration Complete! Ready to Jump."
+            self.previous_hip_y = self.standing_y_hip
+
+        if self.calibrated:
+            hip_smoothed = self.hip_ema.smooth(hip_y)
+            velocity = hip_smoothed - self.previous_hip_y
+            self.previous_hip_y = hip_y
+            if self.state == "IDLE":
+                if hip_y > self.crouch_threshold:
+                    self.state = "CROUCHING"
+                    self.feedback = "Crouching..."
+            elif self.state == "CROUCHING":
+                if velocity < TAKE_OFF_VELOCITY * self.frame_step:
+                    self.state = "JUMPING"
+                    self.feedback = "JUMP!"
+                    self.current_jump_peak = hip_y
+            elif self.state == "JUMPING":
+                self.current_jump_peak = min(self.current_jump_peak, hip_y)
+                if velocity > LANDING_VELOCITY * self.frame_step:
+                    jump_height_pixels = self.standing_y_hip - self.current_jump_peak
+                    self.last_jump_height_cm = jump_height_pixels * self.pixels_to_cm_ratio
+                    self.jump_counter += 1
+                    self.state = "IDLE"
+                    self.feedback = "Nice jump!"
+        return self._info()
+
+    def _info(self):
+        return {
+            "count": self.jump_counter,
+            "state": self.state,
+            "last_jump_cm": round(float(self.last_jump_height_cm), 1),
+        }
+
+    def set_frame_step(self, step: int) -> None:
+        # Calibration lasts CALIBRATION_FRAMES source frames, and hip velocity
+        # is per update, i.e. over `step` source frames, so the take-off and
+        # landing thresholds scale with it. The hip moving average and EMA are
+        # rescaled to cover the same source frames as at full rate.
+        previous = self.frame_step
+        super().set_frame_step(step)
+        if self.frame_step == previous:
+            return
+        # Whatever is left of the calibration keeps its length in source frames.
+        self.calibration_frames = -(-self.calibration_frames * previous // self.frame_step)
+        window, self.hip_ema.alpha = jump_smoothing(self.frame_step)
+        self.hip_y_history = deque(self.hip_y_history, maxlen=window)
+
+    def near_transition(self) -> bool:
+        # Calibration counts frames and the jump itself is decided by per-frame
+        # hip velocity, so only the standing IDLE state can be sub-sampled.
+        return self.state != "IDLE"
+
+    def render(self, frame, results, out=None):
+        h, w = frame.shape[:2]
+        output = self._output(frame, out)
         alpha = 0.7
-        cv2.rectangle(overlay, (20, 20), (340, 160), (29, 29, 29), -1)
-        cv2.putText(overlay, 'JUMP COUNT', (40, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2, cv2.LINE_AA)
-        cv2.putText(overlay, str(self.jump_counter), (45, 125), cv2.FONT_HERSHEY_SIMPLEX, 2.5, (255, 255, 255), 4, cv2.LINE_AA)
-        cv2.putText(overlay, 'LAST JUMP (CM)', (160, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2, cv2.LINE_AA)
-        cv2.putText(overlay, f"{self.last_jump_height_cm:.1f}", (165, 125), cv2.FONT_HERSHEY_SIMPLEX, 2.5, (255, 255, 255), 4, cv2.LINE_AA)
 
         bar_color = (29, 29, 29)
         text_color = (255, 255, 255)
@@ -222,17 +375,46 @@ class JumpCounter(BaseCounter):
             bar_color = (0, 255, 255)
             text_color = (0, 0, 0)
 
-        cv2.rectangle(overlay, (20, h - 70), (w - 20, h - 20), bar_color, -1)
         (text_w, _), _ = cv2.getTextSize(self.feedback, cv2.FONT_HERSHEY_SIMPLEX, 0.9, 2)
-        cv2.putText(overlay, self.feedback, (int((w - text_w) / 2), h - 38), cv2.FONT_HERSHEY_SIMPLEX, 0.9, text_color, 2, cv2.LINE_AA)
-        output = cv2.addWeighted(overlay, alpha, output, 1 - alpha, 0)
+        panel = ((20, 20), (340, 160))
+        panel_texts = (
+            ('JUMP COUNT', (40, 50), 0.7, (200, 200, 200), 2),
+            (str(self.jump_counter), (45, 125), 2.5, (255, 255, 255), 4),
+            ('LAST JUMP (CM)', (160, 50), 0.7, (200, 200, 200), 2),
+            (f"{self.last_jump_height_cm:.1f}", (165, 125), 2.5, (255, 255, 255), 4),
+        )
+        bar = ((20, h - 70), (w - 20, h - 20))
+        bar_text = (self.feedback, (int((w - text_w) / 2), h - 38), 0.9, text_color, 2)
+
+        # The HUD is translucent, but only its two regions are blended; the rest
+        # of the frame is left as it is. Each region is copied into the overlay
+        # buffer, drawn on there and blended back into the output in place.
+        regions = [
+            _union([_box(*panel)] + [_text_box(t, org, scale, th) for t, org, scale, _, th in panel_texts], frame.shape),
+            _union([_box(*bar), _text_box(bar_text[0], bar_text[1], bar_text[2], bar_text[4])], frame.shape),
+        ]
+        if _overlaps(*regions):
+            regions = [_union(regions, frame.shape)]
+        regions = [(slice(y0, y1), slice(x0, x1)) for x0, y0, x1, y1 in regions if x1 > x0 and y1 > y0]
+        overlay = self.buffer("overlay", frame.shape)
+        for roi in regions:
+            np.copyto(overlay[roi], output[roi])
+        cv2.rectangle(overlay, panel[0], panel[1], (29, 29, 29), -1)
+        for text, org, scale, color, thickness in panel_texts:
+            cv2.putText(overlay, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness, cv2.LINE_AA)
+        cv2.rectangle(overlay, bar[0], bar[1], bar_color, -1)
+        text, org, scale, color, thickness = bar_text
+        cv2.putText(overlay, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness, cv2.LINE_AA)
+        for roi in regions:
+            cv2.addWeighted(overlay[roi], alpha, output[roi], 1 - alpha, 0, dst=output[roi])
 
         self.draw_landmarks(output, results)
         if self.calibrated:
             cv2.line(output, (0, int(self.crouch_threshold)), (w, int(self.crouch_threshold)), (0, 0, 255), 2, cv2.LINE_AA)
+        return output
 
-        return output, {
-            "count": self.jump_counter,
-            "state": self.state,
-            "last_jump_cm": round(float(self.last_jump_height_cm), 1),
-        }
\ No newline at end of file
+
+COUNTERS = {
+    "situp": SitupCounter,
+    "jump": JumpCounter,
+}
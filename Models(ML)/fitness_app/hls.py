@@ -0,0 +1,159 @@
+# hls.py
+# Progressive overlay output: an HLS playlist that grows while the job runs.
+#
+# An overlay job whose output name ends in ".hls" writes a directory instead of
+# a single MP4: short MPEG-TS segments plus index.m3u8, which gains an entry as
+# each segment is closed and #EXT-X-ENDLIST once the whole video is done. The
+# playlist exists from the moment the job is accepted, so a player can start on
+# the first segment a few seconds after upload and time to first frame no
+# longer grows with the length of the video.
+#
+# With ffmpeg on PATH the frames are piped into its HLS muxer (H.264 on one
+# continuous timeline). Without it every segment is its own OpenCV writer, and
+# since each of those starts its timestamps at zero the playlist marks every
+# boundary with #EXT-X-DISCONTINUITY.
+
+import os
+import math
+import shutil
+import subprocess
+
+HLS_SEGMENT_SECONDS = float(os.environ.get("HLS_SEGMENT_SECONDS", 2))
+HLS_SUFFIX = ".hls"
+PLAYLIST = "index.m3u8"
+SEGMENT_PATTERN = "seg_%05d.ts"
+PLAYLIST_MEDIA_TYPE = "application/vnd.apple.mpegurl"
+SEGMENT_MEDIA_TYPE = "video/mp2t"
+# MPEG-TS only takes some codec tags and OpenCV builds differ in which
+# encoders they ship, so the first one that opens wins.
+FOURCCS = ("H264", "avc1", "mp4v")
+
+
+def is_stream(name) -> bool:
+    """Whether an output name is an HLS directory rather than a video file."""
+    return bool(name) and name.endswith(HLS_SUFFIX)
+
+
+def playlist_url(base_url: str, name: str) -> str:
+    return f"{base_url}hls/{name}/{PLAYLIST}"
+
+
+def _header(target_duration: int):
+    return [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        "#EXT-X-PLAYLIST-TYPE:EVENT",
+        f"#EXT-X-TARGETDURATION:{target_duration}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+    ]
+
+
+def _write_playlist(directory, lines) -> None:
+    # Players poll the playlist, so it is swapped in whole, never rewritten in place.
+    tmp_path = os.path.join(directory, f".{PLAYLIST}")
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, os.path.join(directory, PLAYLIST))
+
+
+def create(directory, segment_seconds: float = HLS_SEGMENT_SECONDS) -> None:
+    """Create `directory` with an empty, still-open playlist."""
+    os.makedirs(directory, exist_ok=True)
+    _write_playlist(directory, _header(math.ceil(segment_seconds)))
+
+
+class HlsWriter:
+    """Drop-in for cv2.VideoWriter (write/release) that emits an HLS stream."""
+
+    def __init__(self, directory, fps, size, segment_seconds: float = HLS_SEGMENT_SECONDS) -> None:
+        self.directory = directory
+        self.fps = float(fps) or 30.0
+        self.size = tuple(size)
+        self.segment_seconds = float(segment_seconds)
+        # Whole frames per segment, rounded down so no segment outlasts the target duration.
+        self.segment_frames = max(1, int(self.fps * self.segment_seconds))
+        self.target_duration = max(1, math.ceil(self.segment_frames / self.fps))
+        self.durations = []
+        self._writer = None
+        self._segment_path = None
+        self._frames = 0
+        self._released = False
+        create(directory, self.segment_seconds)
+        ffmpeg = shutil.which("ffmpeg")
+        self._proc = self._start_ffmpeg(ffmpeg) if ffmpeg else None
+
+    # --- ffmpeg muxer ---
+    def _start_ffmpeg(self, ffmpeg):
+        width, height = self.size
+        command = [
+            ffmpeg, "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(self.fps), "-i", "-",
+            "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+            "-force_key_frames", f"expr:gte(t,n_forced*{self.segment_seconds})",
+            "-f", "hls", "-hls_time", str(self.segment_seconds), "-hls_playlist_type", "event",
+            "-hls_flags", "temp_file",
+            "-hls_segment_filename", os.path.join(self.directory, SEGMENT_PATTERN),
+            os.path.join(self.directory, PLAYLIST),
+        ]
+        return subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    # --- OpenCV segments ---
+    def _open_segment(self) -> None:
+        import cv2  # only the job workers write video; the API imports this module for its names
+
+        name = SEGMENT_PATTERN % len(self.durations)
+        # Written under a hidden name so a segment is never served half-written.
+        self._segment_path = os.path.join(self.directory, f".{name}")
+        for code in FOURCCS:
+            writer = cv2.VideoWriter(self._segment_path, cv2.VideoWriter_fourcc(*code), self.fps, self.size)
+            if writer.isOpened():
+                self._writer = writer
+                return
+            writer.release()
+        raise RuntimeError(f"No MPEG-TS encoder available (tried {', '.join(FOURCCS)})")
+
+    def _close_segment(self) -> None:
+        self._writer.release()
+        self._writer = None
+        os.replace(self._segment_path, os.path.join(self.directory, os.path.basename(self._segment_path)[1:]))
+        self.durations.append(self._frames / self.fps)
+        self._frames = 0
+        self._publish()
+
+    def _publish(self, ended: bool = False) -> None:
+        lines = _header(self.target_duration)
+        for i, duration in enumerate(self.durations):
+            if i:
+                lines.append("#EXT-X-DISCONTINUITY")
+            lines.append(f"#EXTINF:{duration:.3f},")
+            lines.append(SEGMENT_PATTERN % i)
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+        _write_playlist(self.directory, lines)
+
+    # --- VideoWriter interface ---
+    def write(self, frame) -> None:
+        if self._proc is not None:
+            self._proc.stdin.write(frame.data if frame.flags.c_contiguous else frame.tobytes())
+            return
+        if self._writer is None:
+            self._open_segment()
+        self._writer.write(frame)
+        self._frames += 1
+        if self._frames >= self.segment_frames:
+            self._close_segment()
+
+    def release(self) -> None:
+        """Close the last segment and end the playlist."""
+        if self._released:
+            return
+        self._released = True
+        if self._proc is not None:
+            self._proc.stdin.close()
+            code = self._proc.wait()
+            if code != 0:
+                raise RuntimeError(f"ffmpeg HLS muxer exited with status {code}")
+            return
+        if self._writer is not None:
+            self._close_segment()
+        self._publish(ended=True)
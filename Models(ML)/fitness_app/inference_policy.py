@@ -0,0 +1,57 @@
+# inference_policy.py
+# Which frames of a video get pose inference, and at what resolution.
+#
+# The rep state machines do not need every frame of a 60 fps 1080p upload.
+# A policy analyses frames at target_fps, caps the inference resolution at
+# max_dim, and in adaptive mode goes back to every frame whenever the counter
+# reports it is near a state transition. model_complexity selects MediaPipe's
+# lite (0), full (1, the default) or heavy (2) model; see quality.py.
+
+import os
+
+
+class InferencePolicy:
+    def __init__(self, target_fps=None, max_dim=None, adaptive: bool = False, model_complexity: int = 1) -> None:
+        self.target_fps = float(target_fps) if target_fps else None
+        self.max_dim = int(max_dim) if max_dim else None
+        self.adaptive = bool(adaptive)
+        self.model_complexity = int(model_complexity)
+
+    @classmethod
+    def from_env(cls) -> "InferencePolicy":
+        return cls(
+            target_fps=os.environ.get("INFER_TARGET_FPS") or None,
+            max_dim=os.environ.get("INFER_MAX_DIM") or None,
+            adaptive=os.environ.get("INFER_ADAPTIVE", "0").lower() in ("1", "true", "yes"),
+        )
+
+    @property
+    def is_full(self) -> bool:
+        """True when every frame is analysed at source resolution."""
+        return self.target_fps is None and self.max_dim is None
+
+    def stride(self, source_fps: float, counter=None) -> int:
+        """Number of source frames to advance before the next analysed frame."""
+        if self.target_fps is None or source_fps <= self.target_fps:
+            return 1
+        if self.adaptive and counter is not None and counter.near_transition():
+            return 1
+        return max(1, int(round(source_fps / self.target_fps)))
+
+    def signature(self) -> str:
+        signature = f"fps={self.target_fps or 'all'},dim={self.max_dim or 'src'},adaptive={int(self.adaptive)}"
+        # The default model leaves the signature (and so existing cache keys) unchanged.
+        if self.model_complexity != 1:
+            signature += f",complexity={self.model_complexity}"
+        return signature
+
+    def to_dict(self) -> dict:
+        return {
+            "target_fps": self.target_fps,
+            "max_dim": self.max_dim,
+            "adaptive": self.adaptive,
+            "model_complexity": self.model_complexity,
+        }
+
+
+FULL_POLICY = InferencePolicy()
@@ -0,0 +1,172 @@
+# ingest.py
+# Streaming upload ingestion.
+#
+# Uploads are copied to disk in fixed-size chunks and hashed on the way, so a
+# request never holds more than one chunk in memory whatever the video length,
+# and the landmark cache key is known without reading the file again. For
+# containers that can be decoded front to back, the chunks can also be fed to
+# a named pipe so processing starts before the upload has finished.
+
+import os
+import errno
+import asyncio
+import hashlib
+import tempfile
+
+from starlette.concurrency import run_in_threadpool
+
+CHUNK_SIZE = 1024 * 1024
+# Uploads are spooled next to processed_videos/pending, on the same
+# filesystem, so parking the source of a stats-only job is a rename rather
+# than a second copy of the whole upload.
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", os.path.join("processed_videos", ".uploads"))
+MAX_UPLOAD_BYTES = int(float(os.environ.get("MAX_UPLOAD_MB", 500)) * 1024 * 1024)
+
+# Containers OpenCV/FFmpeg can decode without seeking to the end first.
+STREAMABLE_TYPES = {"video/mp2t", "video/webm", "video/x-matroska"}
+STREAMABLE_SUFFIXES = {"video/mp2t": ".ts", "video/webm": ".webm", "video/x-matroska": ".mkv"}
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+        self.max_bytes = max_bytes
+
+
+class Upload:
+    """A fully received upload on disk."""
+
+    def __init__(self, path, size: int, digest: str) -> None:
+        self.path = path
+        self.size = size
+        self.digest = digest
+
+
+async def _copy_chunks(chunks, sinks, max_bytes):
+    h = hashlib.sha256()
+    size = 0
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        h.update(chunk)
+        for sink in sinks:
+            await run_in_threadpool(sink.write, chunk)
+    return size, h.hexdigest()
+
+
+async def _upload_file_chunks(file, chunk_size):
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def save_chunks(chunks, suffix: str = ".mp4", max_bytes: int = MAX_UPLOAD_BYTES) -> Upload:
+    """Write an async iterator of byte chunks to a temp file."""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=UPLOAD_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            size, digest = await _copy_chunks(chunks, [f], max_bytes)
+    except BaseException:
+        os.remove(path)
+        raise
+    return Upload(path, size, digest)
+
+
+async def save_upload_file(file, max_bytes: int = MAX_UPLOAD_BYTES) -> Upload:
+    """Copy a multipart UploadFile to a temp file chunk by chunk."""
+    return await save_chunks(_upload_file_chunks(file, CHUNK_SIZE), max_bytes=max_bytes)
+
+
+class PipedUpload:
+    """An upload fed to a named pipe for the decoder while it is also spooled to disk.
+
+    The spool file is the complete copy used for hashing and for keeping the
+    source; the pipe is what the worker decodes from while chunks arrive.
+    The spool only appears under spool_path once the whole upload has been
+    received, so a worker that finds it missing knows its input was cut short.
+    """
+
+    def __init__(self, suffix: str) -> None:
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="upload-", dir=UPLOAD_DIR)
+        self.pipe_path = os.path.join(self.directory, "pipe" + suffix)
+        self.spool_path = os.path.join(self.directory, "source" + suffix)
+        self._partial_path = os.path.join(self.directory, "partial" + suffix)
+        os.mkfifo(self.pipe_path)
+        self.size = 0
+        self.digest = None
+
+    async def _open_pipe(self, timeout: float) -> int:
+        # A non-blocking open of a FIFO's write end fails with ENXIO until the
+        # decoder has opened the read end, so poll instead of parking a thread.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            try:
+                fd = os.open(self.pipe_path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as e:
+                if e.errno != errno.ENXIO or loop.time() > deadline:
+                    raise
+                await asyncio.sleep(0.05)
+                continue
+            os.set_blocking(fd, True)
+            return fd
+
+    def _release_reader(self) -> None:
+        # However the feed ended, a decoder opening the pipe must not wait for
+        # a writer forever. A write end is held while the FIFO is unlinked: a
+        # reader already waiting gets end of stream, later ones find no file.
+        # (On Linux, O_RDWR opens a FIFO without waiting for the other end.)
+        try:
+            fd = os.open(self.pipe_path, os.O_RDWR | os.O_NONBLOCK)
+        except FileNotFoundError:
+            return
+        try:
+            os.unlink(self.pipe_path)
+        finally:
+            os.close(fd)
+
+    async def feed(self, chunks, max_bytes: int = MAX_UPLOAD_BYTES, open_timeout: float = 30.0) -> None:
+        """Copy `chunks` to the pipe and the spool.
+
+        Raises UploadTooLarge, OSError if no decoder opened the pipe within
+        `open_timeout`, or whatever the chunk iterator raises (e.g. on a client
+        disconnect). In every case the decoder sees end of stream and the spool
+        is left incomplete.
+        """
+        try:
+            pipe = _PipeSink(await self._open_pipe(open_timeout))
+            try:
+                with open(self._partial_path, "wb") as spool:
+                    self.size, self.digest = await _copy_chunks(chunks, [spool, pipe], max_bytes)
+                # The spool is complete before the decoder sees end of stream.
+                os.replace(self._partial_path, self.spool_path)
+            finally:
+                pipe.close()
+        finally:
+            self._release_reader()
+
+
+class _PipeSink:
+    """Pipe writer that goes quiet, leaving the spool running, if the reader goes away."""
+
+    def __init__(self, fd: int) -> None:
+        self.fd = fd
+        self.broken = False
+
+    def write(self, chunk) -> None:
+        view = memoryview(chunk)
+        while view and not self.broken:
+            try:
+                view = view[os.write(self.fd, view):]
+            except BrokenPipeError:
+                self.broken = True
+
+    def close(self) -> None:
+        os.close(self.fd)
@@ -0,0 +1,345 @@
+# jobs.py
+# Bounded process-pool job queue for video processing.
+#
+# Video processing is CPU bound and blocks for the length of the upload, so it
+# must never run on the uvicorn event loop. Jobs are handed to a pool of warm
+# worker processes; the API only keeps bookkeeping (status, progress, result).
+
+import os
+import time
+import uuid
+import shutil
+import logging
+import threading
+import multiprocessing
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import JOB_BUCKETS, REGISTRY, SamplingProfiler
+from quality import QualityController
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", os.cpu_count() or 1))
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 2 * JOB_WORKERS))
+JOB_HISTORY = int(os.environ.get("JOB_HISTORY", 1000))
+# Queue wait above which new jobs get a lighter quality tier (see quality.py).
+QUALITY_JOB_WAIT_SLO = float(os.environ.get("QUALITY_JOB_WAIT_SLO_S", 10))
+JOB_WARMUP_TIMEOUT = float(os.environ.get("JOB_WARMUP_TIMEOUT_S", 300))
+
+
+JOBS_TOTAL = REGISTRY.counter("fitness_jobs_total", "Finished jobs by kind and outcome.", ["kind", "status"])
+JOB_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "fitness_job_queue_wait_seconds", "Time from submission until a worker picks a job up.", buckets=JOB_BUCKETS,
+)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+    def __init__(self, queue_depth: int) -> None:
+        super().__init__(f"Job queue is full ({queue_depth} waiting)")
+        self.queue_depth = queue_depth
+
+
+# --- Worker side (runs in the pool processes) ---
+_progress = None
+_init_timings = {}
+_unavailable_models = []
+
+
+def _init_worker(progress) -> None:
+    global _progress
+    _progress = progress
+    # Pay the heavy imports once per worker instead of on the first job.
+    t0 = time.perf_counter()
+    import env_setup  # noqa: F401
+    import processing  # noqa: F401
+    from pose_pool import get_pool
+    from quality import prewarm_tiers
+    t1 = time.perf_counter()
+    get_pool().prewarm()
+    _unavailable_models.extend(prewarm_tiers())
+    t2 = time.perf_counter()
+    _init_timings.update(import_s=round(t1 - t0, 3), pose_engines_s=round(t2 - t1, 3))
+
+
+def _warm_up(barrier) -> dict:
+    """Run a blank inference on this worker's engines and report its startup timings
+    and the model complexities it could not load.
+
+    Waiting at the barrier keeps a worker from taking a second warm-up task,
+    so every worker of the pool gets exactly one.
+    """
+    from pose_pool import default_pools
+    t0 = time.perf_counter()
+    healthy = all([pool.health_check() for pool in default_pools()])
+    inference_s = time.perf_counter() - t0
+    barrier.wait(JOB_WARMUP_TIMEOUT)
+    return {"pid": os.getpid(), "healthy": healthy, **_init_timings, "warmup_inference_s": round(inference_s, 3),
+            "unavailable_models": list(_unavailable_models)}
+
+
+def _reporter(job_id):
+    # Progress is (fraction, running counter info or None).
+    def report(fraction, live=None):
+        _progress[job_id] = (fraction, live)
+
+    _progress[job_id] = (0.0, None)
+    return report
+
+
+def _instrumented(fn, profile, *args, **kwargs):
+    """Run fn and return (result, telemetry) for the API process.
+
+    The worker's metrics registry is reset per job, so the snapshot holds
+    this job's observations only.
+    """
+    started_at = time.time()
+    REGISTRY.reset()
+    profiler = SamplingProfiler().start() if profile else None
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        report = profiler.stop() if profiler is not None else None
+    if report is not None:
+        result["profile"] = report
+    return result, {"started_at": started_at, "metrics": REGISTRY.snapshot()}
+
+
+def _run_job(job_id, kind, video_path, base_url, render=True, digest=None, source_path=None, profile=False,
+             output_filename=None, tier=None):
+    from processing import process_video_file
+    return _instrumented(
+        process_video_file, profile, kind, video_path, base_url, progress_cb=_reporter(job_id), render=render,
+        digest=digest, source_path=source_path, output_filename=output_filename, tier=tier,
+    )
+
+
+def _run_render(job_id, video_name, base_url, profile=False):
+    from processing import render_pending
+    return _instrumented(render_pending, profile, video_name, base_url, progress_cb=_reporter(job_id))
+
+
+# --- API side ---
+class Job:
+    def __init__(self, job_id, kind, cleanup=()) -> None:
+        self.job_id = job_id
+        self.kind = kind
+        # Files or directories to delete once the job has ended.
+        self.cleanup = list(cleanup)
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.result = None
+        self.error = None
+        self.future = None
+
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS, queue_size: int = JOB_QUEUE_SIZE) -> None:
+        self.workers = max(1, int(workers))
+        self.queue_size = max(0, int(queue_size))
+        self._ctx = multiprocessing.get_context("spawn")
+        self._executor = None
+        self._manager = None
+        self._progress = None
+        self._jobs = OrderedDict()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        # Landmark cache outcomes reported by finished jobs ("hit"/"miss").
+        self.cache_outcomes = Counter()
+        # Picks each job's quality tier from the backlog and recent queue waits.
+        self.quality = QualityController(slo=QUALITY_JOB_WAIT_SLO)
+
+    def _ensure_started(self) -> None:
+        if self._executor is not None:
+            return
+        if self._manager is None:
+            self._manager = self._ctx.Manager()
+            self._progress = self._manager.dict()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self._ctx,
+            initializer=_init_worker,
+            initargs=(self._progress,),
+        )
+
+    def warm_up(self):
+        """Start every worker and run a warm-up inference on it; futures of their reports."""
+        with self._lock:
+            self._ensure_started()
+            barrier = self._manager.Barrier(self.workers)
+            return [self._executor.submit(_warm_up, barrier) for _ in range(self.workers)]
+
+    def start(self) -> None:
+        with self._lock:
+            self._ensure_started()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
+                self._progress = None
+
+    @property
+    def full(self) -> bool:
+        return self._in_flight >= self.workers + self.queue_size
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def idle_workers(self) -> int:
+        return max(0, self.workers - self._in_flight)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of accepted jobs still waiting for a free worker."""
+        return max(0, self._in_flight - self.workers)
+
+    def submit(self, kind, video_path, base_url, render=True, digest=None, source_path=None, cleanup=None,
+               profile=False, output_filename=None) -> Job:
+        """Queue an uploaded video.
+
+        The upload (or whatever `cleanup` lists instead) is deleted once the
+        job ends. source_path is the complete copy of an upload whose
+        video_path is a pipe still being fed. With profile=True the result
+        carries a sampling profile of the worker under "profile".
+        output_filename fixes the name of the overlay output up front.
+        The quality tier is chosen from the current load.
+        """
+        job = self._enqueue(kind, [video_path] if cleanup is None else cleanup)
+        tier = self.quality.choose(self.queue_depth).name
+        return self._start(
+            job, _run_job, job.job_id, kind, video_path, base_url, render, digest, source_path, profile,
+            output_filename, tier,
+        )
+
+    def submit_render(self, video_name, base_url, profile=False) -> Job:
+        """Queue the deferred overlay render of a stats-only job."""
+        job = self._enqueue("render")
+        return self._start(job, _run_render, job.job_id, video_name, base_url, profile)
+
+    def _enqueue(self, kind, cleanup=()) -> Job:
+        with self._lock:
+            if self.full:
+                raise QueueFullError(self.queue_depth)
+            self._ensure_started()
+            job = Job(uuid.uuid4().hex, kind, cleanup)
+            self._jobs[job.job_id] = job
+            self._in_flight += 1
+            self._trim_history()
+        return job
+
+    def cancel(self, job, reason: str) -> None:
+        """Mark a job whose input never fully arrived as cancelled.
+
+        A running worker cannot be interrupted, but a job left without input
+        ends quickly; whatever it returns is then discarded.
+        """
+        if job.status == "queued":
+            job.error = reason
+            job.status = "cancelled"
+
+    def _replace_broken(self, executor) -> None:
+        # A worker died (e.g. MediaPipe crashed) and took the pool with it; the
+        # next submission starts a fresh one. Every job of the old pool fails
+        # with BrokenProcessPool, but only the first replaces it.
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        logger.warning("Job queue: worker pool broke, starting a new one.")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _start(self, job, fn, *args) -> Job:
+        with self._lock:
+            self._ensure_started()
+            executor = self._executor
+        try:
+            job.future = executor.submit(fn, *args)
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            job.status = "failed"
+            JOBS_TOTAL.inc(kind=job.kind, status=job.status)
+            with self._lock:
+                self._in_flight -= 1
+            self._cleanup(job)
+            if isinstance(e, BrokenProcessPool):
+                self._replace_broken(executor)
+            raise
+        job.future.add_done_callback(lambda fut, job=job: self._finish(job, fut, executor))
+        return job
+
+    def _cleanup(self, job) -> None:
+        for path in job.cleanup:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _finish(self, job, fut, executor) -> None:
+        try:
+            result, telemetry = fut.result()
+            if job.status != "cancelled":
+                job.result = result
+                job.status = "done"
+                wait = max(0.0, telemetry["started_at"] - job.submitted_at)
+                JOB_QUEUE_WAIT_SECONDS.observe(wait)
+                self.quality.observe(wait)
+                REGISTRY.merge(telemetry["metrics"])
+                outcome = job.result.get("timings", {}).get("landmark_cache")
+                if outcome:
+                    self.cache_outcomes[outcome] += 1
+        except Exception as e:
+            if job.status != "cancelled":
+                job.error = str(e) or type(e).__name__
+                job.status = "failed"
+            if isinstance(e, BrokenProcessPool):
+                self._replace_broken(executor)
+        JOBS_TOTAL.inc(kind=job.kind, status=job.status)
+        with self._lock:
+            self._in_flight -= 1
+        self._cleanup(job)
+        try:
+            self._progress.pop(job.job_id, None)
+        except Exception:
+            pass
+
+    def _trim_history(self) -> None:
+        while len(self._jobs) > JOB_HISTORY:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.status == "queued":
+                break
+            self._jobs.popitem(last=False)
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def status(self, job: Job) -> dict:
+        info = {"job_id": job.job_id, "kind": job.kind, "status": job.status}
+        if job.status == "queued":
+            progress = self._progress.get(job.job_id) if self._progress is not None else None
+            if progress is not None:
+                fraction, live = progress
+                info["status"] = "running"
+                info["progress"] = round(float(fraction), 3)
+                if live:
+                    info["live"] = live
+            else:
+                info["queue_depth"] = self.queue_depth
+        elif job.status == "done":
+            info["progress"] = 1.0
+            info["result"] = job.result
+        else:
+            info["error"] = job.error
+        return info
@@ -0,0 +1,157 @@
+# landmark_cache.py
+# Content-addressed on-disk cache of per-frame pose landmarks.
+#
+# Pose inference dominates the cost of a video, and the same clip is often
+# analysed again (app retries, situp vs jump, threshold tuning). Entries are
+# keyed by the SHA-256 of the upload plus the inference policy, and stored as
+# plain .npy files so they can be memory-mapped on replay:
+#   <key>.npy      (analysed frames, 33, 4) float32 landmarks
+#   <key>.idx.npy  source frame index of every row, int32
+#   <key>.json     frame size, fps and frame count
+# The directory is shared by all worker processes. Its total size is capped by
+# evicting the least recently used entries (mtime is bumped on every hit).
+
+import os
+import json
+import uuid
+import hashlib
+import threading
+
+import numpy as np
+
+LANDMARK_CACHE_DIR = os.environ.get("LANDMARK_CACHE_DIR", "landmark_cache")
+LANDMARK_CACHE_MAX_BYTES = int(float(os.environ.get("LANDMARK_CACHE_MAX_MB", 512)) * 1024 * 1024)
+# Bump when the stored format or the inference that produces it changes.
+CACHE_VERSION = 1
+
+_SUFFIXES = (".npy", ".idx.npy", ".json")
+
+
+def file_digest(path, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class CachedLandmarks:
+    def __init__(self, landmarks, frame_index, meta) -> None:
+        self.landmarks = landmarks
+        self.frame_index = frame_index
+        self.frame_height = int(meta["frame_height"])
+        self.frame_width = int(meta["frame_width"])
+        self.fps = meta["fps"]
+        self.frames = int(meta["frames"])
+
+
+class LandmarkCache:
+    def __init__(self, directory: str = LANDMARK_CACHE_DIR, max_bytes: int = LANDMARK_CACHE_MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(digest: str, policy, kind=None) -> str:
+        # Adaptive sampling follows the counter state, so its frames depend on the exercise.
+        scope = f"v{CACHE_VERSION}|{policy.signature()}|{kind if policy.adaptive else '*'}"
+        return f"{digest}-{hashlib.sha1(scope.encode()).hexdigest()[:12]}"
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key + suffix)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key, ".json")) as f:
+                meta = json.load(f)
+            landmarks = np.load(self._path(key, ".npy"), mmap_mode="r")
+            frame_index = np.load(self._path(key, ".idx.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            self._count("misses")
+            return None
+        try:
+            os.utime(self._path(key, ".npy"))
+        except OSError:
+            pass
+        self._count("hits")
+        return CachedLandmarks(landmarks, frame_index, meta)
+
+    def put(self, key: str, landmarks, frame_index, meta: dict) -> None:
+        # Write under temporary names and rename, so readers never see a partial
+        # entry. The .json goes last because get() opens it first.
+        tmp = f".{uuid.uuid4().hex}"
+        arrays = ((".npy", np.asarray(landmarks, dtype=np.float32)),
+                  (".idx.npy", np.asarray(frame_index, dtype=np.int32)))
+        for suffix, array in arrays:
+            with open(self._path(key, suffix) + tmp, "wb") as f:
+                np.save(f, array)
+            os.replace(self._path(key, suffix) + tmp, self._path(key, suffix))
+        with open(self._path(key, ".json") + tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(self._path(key, ".json") + tmp, self._path(key, ".json"))
+        self._count("stores")
+        self.evict()
+
+    def _entries(self):
+        """{key: (bytes, last_access)} for every complete entry on disk."""
+        entries = {}
+        with os.scandir(self.directory) as it:
+            for e in it:
+                if e.name.startswith(".") or not e.name.endswith(".npy") or e.name.endswith(".idx.npy"):
+                    continue
+                key = e.name[:-len(".npy")]
+                try:
+                    size = sum(os.path.getsize(self._path(key, s)) for s in _SUFFIXES)
+                    entries[key] = (size, e.stat().st_mtime)
+                except OSError:
+                    continue
+        return entries
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        entries = self._entries()
+        total = sum(size for size, _ in entries.values())
+        evicted = 0
+        for key, (size, _) in sorted(entries.items(), key=lambda kv: kv[1][1]):
+            if total <= self.max_bytes:
+                break
+            for suffix in (".json", ".npy", ".idx.npy"):
+                try:
+                    os.remove(self._path(key, suffix))
+                except OSError:
+                    pass
+            total -= size
+            evicted += 1
+        if evicted:
+            with self._lock:
+                self._stats["evictions"] += evicted
+        return evicted
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        with self._lock:
+            s = dict(self._stats)
+        lookups = s["hits"] + s["misses"]
+        s["hit_rate"] = round(s["hits"] / lookups, 3) if lookups else None
+        s["entries"] = len(entries)
+        s["bytes"] = sum(size for size, _ in entries.values())
+        s["max_bytes"] = self.max_bytes
+        return s
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache() -> LandmarkCache:
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LandmarkCache()
+        return _default_cache
@@ -0,0 +1,88 @@
+# landmarks.py
+# Compact array form of MediaPipe pose landmarks.
+#
+# One frame is a (33, 4) float32 array of x, y, z, visibility in MediaPipe's
+# normalised image coordinates; a frame without a detected pose is all NaN.
+# A clip is a (frames, 33, 4) stack of those rows.
+#
+# On the wire (landmark-only endpoints) a batch is the same stack packed as
+# little-endian float32, frame after frame: 33 * 4 * 4 = 528 bytes per frame.
+
+import numpy as np
+
+NUM_LANDMARKS = 33
+NUM_FIELDS = 4  # x, y, z, visibility
+
+# MediaPipe PoseLandmark indices used by the counters.
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+LEFT_HIP = 23
+RIGHT_HIP = 24
+LEFT_KNEE = 25
+RIGHT_KNEE = 26
+
+
+def empty_row():
+    return np.full((NUM_LANDMARKS, NUM_FIELDS), np.nan, dtype=np.float32)
+
+
+def to_array(results):
+    """(33, 4) float32 landmarks of a MediaPipe result, or None if no pose."""
+    if results is None or not results.pose_landmarks:
+        return None
+    return np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility) for lm in results.pose_landmarks.landmark],
+        dtype=np.float32,
+    )
+
+
+def stack(rows):
+    """Stack per-frame rows (arrays or None) into a (frames, 33, 4) array."""
+    out = np.full((len(rows), NUM_LANDMARKS, NUM_FIELDS), np.nan, dtype=np.float32)
+    for i, row in enumerate(rows):
+        if row is not None:
+            out[i] = row
+    return out
+
+
+FRAME_BYTES = NUM_LANDMARKS * NUM_FIELDS * 4
+_WIRE_DTYPE = np.dtype("<f4")
+
+
+def from_bytes(data):
+    """Unpack a wire batch into a (frames, 33, 4) float32 stack.
+
+    A frame with any NaN is treated as having no pose at all, so a client can
+    mark missed detections by sending a single NaN.
+    """
+    if not data or len(data) % FRAME_BYTES:
+        raise ValueError(f"Landmark batch must be a non-empty multiple of {FRAME_BYTES} bytes")
+    batch = np.frombuffer(data, dtype=_WIRE_DTYPE).reshape(-1, NUM_LANDMARKS, NUM_FIELDS).astype(np.float32)
+    batch[np.isnan(batch).any(axis=(1, 2))] = np.nan
+    return batch
+
+
+def to_bytes(batch) -> bytes:
+    return np.ascontiguousarray(batch, dtype=_WIRE_DTYPE).tobytes()
+
+
+def valid_mask(landmarks):
+    """Frames of a (frames, 33, 4) stack that contain a pose."""
+    return ~np.isnan(landmarks[:, 0, 0])
+
+
+class _Results:
+    def __init__(self, pose_landmarks) -> None:
+        self.pose_landmarks = pose_landmarks
+
+
+def to_results(row):
+    """Wrap a (33, 4) row so it can be fed to code expecting MediaPipe results."""
+    from mediapipe.framework.formats import landmark_pb2
+
+    if row is None or np.isnan(row[0, 0]):
+        return _Results(None)
+    proto = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, visibility in row.tolist():
+        proto.landmark.add(x=x, y=y, z=z, visibility=visibility)
+    return _Results(proto)
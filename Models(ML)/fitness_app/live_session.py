@@ -0,0 +1,53 @@
+# live_session.py
+# Per-connection state for real-time analysis over a WebSocket.
+#
+# Clients push frames faster than pose inference may keep up with. Instead of
+# queueing (and letting latency grow without bound), each session keeps only
+# the newest frame that has not been analysed yet; older ones are dropped.
+# The frames of all sessions are analysed by one shared InferenceScheduler
+# (see scheduler.py), which also enforces each session's fps budget.
+
+import time
+import asyncio
+
+from counters import COUNTERS
+
+
+class LiveSession:
+    def __init__(self, kind: str, scheduler, max_fps=None) -> None:
+        self.kind = kind
+        self.scheduler = scheduler
+        self.max_fps = max_fps
+        self.counter = None
+        self.scheduled = None
+        self.received = 0
+
+    @property
+    def processed(self) -> int:
+        return self.scheduled.processed if self.scheduled is not None else 0
+
+    async def open(self) -> None:
+        # The counter never borrows a Pose engine: the scheduler's workers bring theirs.
+        self.counter = COUNTERS[self.kind]()
+        self.scheduled = self.scheduler.open(self.kind, self.counter, self.max_fps)
+
+    async def close(self) -> None:
+        if self.scheduled is not None:
+            # Waits for a frame still being analysed, so keep it off the loop.
+            await asyncio.to_thread(self.scheduler.close, self.scheduled)
+        if self.counter is not None:
+            self.counter.close()
+            self.counter = None
+
+    def push(self, data: bytes) -> None:
+        self.received += 1
+        self.scheduler.submit(self.scheduled, (self.received, time.perf_counter(), data))
+
+    async def next_result(self) -> dict:
+        """Wait for the outcome of the next analysed frame.
+
+        Besides the counter info it carries the frame's "seq", the frames
+        "dropped" so far and the receive-to-result "latency_ms", or "seq" and
+        an "error" if the frame could not be analysed.
+        """
+        return await self.scheduled.results.get()
@@ -0,0 +1,289 @@
+# metrics.py
+# Minimal Prometheus-style metrics and a sampling profiler.
+#
+# Video jobs run in worker processes, so what they observe lands in the
+# worker's own registry. Each job ships a snapshot of it back with its result
+# and the API process merges that into its registry, which /metrics renders in
+# the Prometheus text exposition format. Counters and histograms merge by
+# addition; gauges describe the process they live in and are never shipped.
+
+import os
+import sys
+import time
+import bisect
+import threading
+from collections import Counter as _Tally
+
+# Per-frame stage latencies sit in the sub-millisecond to tens of ms range.
+FRAME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0)
+JOB_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+RATIO_BUCKETS = (0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 4.0, 8.0)
+
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", 5)) / 1000.0
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames=()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _labels(self, key, extra=()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {key: self._copy(value) for key, value in self._values.items()}
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def merge(self, values) -> None:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def merge(self, values) -> None:
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._labels(key)} {_number(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, or one read from `fn` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames=(), fn=None) -> None:
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self):
+        if self.fn is not None:
+            return [f"{self.name} {_number(self.fn())}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._labels(key)} {_number(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=FRAME_BUCKETS) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @staticmethod
+    def _copy(value):
+        return [list(value[0]), value[1], value[2]]
+
+    def merge(self, values) -> None:
+        with self._lock:
+            for key, (counts, total, n) in values.items():
+                entry = self._values.get(key)
+                if entry is None:
+                    entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+                entry[2] += n
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total, n) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._labels(key, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self._add(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=(), fn=None) -> Gauge:
+        return self._add(Gauge, name, help, labelnames, fn=fn)
+
+    def histogram(self, name, help, labelnames=(), buckets=FRAME_BUCKETS) -> Histogram:
+        return self._add(Histogram, name, help, labelnames, buckets=buckets)
+
+    def snapshot(self) -> dict:
+        """Counters and histograms as plain data, picklable across processes."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: m.snapshot() for m in metrics if not isinstance(m, Gauge)}
+
+    def merge(self, snapshot) -> None:
+        for name, values in (snapshot or {}).items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(values)
+
+    def reset(self) -> None:
+        for metric in list(self._metrics.values()):
+            if not isinstance(metric, Gauge):
+                metric.reset()
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- Metrics observed on the frame path (job workers and live sessions) ---
+FRAME_STAGE_SECONDS = REGISTRY.histogram(
+    "fitness_frame_stage_seconds", "Time per frame spent in each stage of the video path.", ["stage"],
+)
+FRAMES_PROCESSED = REGISTRY.counter("fitness_frames_processed_total", "Video frames decoded and counted.", ["kind"])
+VIDEO_DURATION_SECONDS = REGISTRY.histogram(
+    "fitness_video_duration_seconds", "Duration of processed videos.", buckets=JOB_BUCKETS,
+)
+VIDEO_PROCESSING_SECONDS = REGISTRY.histogram(
+    "fitness_video_processing_seconds", "Wall time to process a video.", buckets=JOB_BUCKETS,
+)
+VIDEO_REALTIME_RATIO = REGISTRY.histogram(
+    "fitness_video_realtime_ratio", "Processing wall time divided by video duration.", buckets=RATIO_BUCKETS,
+)
+
+
+def observe_video(kind: str, frames: int, fps: float, wall_s: float) -> None:
+    FRAMES_PROCESSED.inc(frames, kind=kind)
+    VIDEO_PROCESSING_SECONDS.observe(wall_s)
+    if fps > 0 and frames > 0:
+        duration = frames / fps
+        VIDEO_DURATION_SECONDS.observe(duration)
+        VIDEO_REALTIME_RATIO.observe(wall_s / duration)
+
+
+# --- Sampling profiler ---
+class SamplingProfiler:
+    """Wall-clock profiler that periodically samples every other thread's stack.
+
+    Stacks are reported collapsed ("outer;inner;leaf") with sample counts, the
+    format flame graph tools read. Waiting threads are sampled too, so the
+    report shows where the wall time went, not only where the CPU was busy.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, max_depth: int = 48) -> None:
+        self.interval = max(0.001, float(interval))
+        self.max_depth = max_depth
+        self._stacks = _Tally()
+        self._samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+
+    def _collapse(self, frame) -> str:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self._stacks[self._collapse(frame)] += 1
+            self._samples += 1
+
+    def start(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, top: int = 40) -> dict:
+        self._stop.set()
+        self._thread.join()
+        return {
+            "interval_ms": round(self.interval * 1000.0, 3),
+            "duration_s": round(time.perf_counter() - self._started, 3),
+            "samples": self._samples,
+            "stacks": [{"stack": stack, "count": count} for stack, count in self._stacks.most_common(top)],
+        }
@@ -0,0 +1,195 @@
+# pose_pool.py
+# Pool of warm MediaPipe Pose graphs shared by the counters.
+#
+# Building a Pose graph loads and initialises the TFLite model, which costs far
+# more than a single inference. Engines are built once, lent to one counter at
+# a time and reset between sessions so no tracking state leaks across users.
+
+import os
+import time
+import threading
+from collections import deque
+
+import mediapipe as mp
+import numpy as np
+
+POSE_POOL_SIZE = int(os.environ.get("POSE_POOL_SIZE", 1))
+POSE_ACQUIRE_TIMEOUT = float(os.environ.get("POSE_ACQUIRE_TIMEOUT", 2.0))
+POSE_OPTIONS = {"min_detection_confidence": 0.6, "min_tracking_confidence": 0.6}
+
+
+class PoseLease:
+    """A Pose engine on loan from a pool, plus how long it took to get it."""
+
+    def __init__(self, pose, cold: bool, acquire_s: float, pooled: bool) -> None:
+        self.pose = pose
+        self.cold = cold
+        self.acquire_s = acquire_s
+        self.pooled = pooled
+
+
+class PosePool:
+    def __init__(self, size: int = POSE_POOL_SIZE, acquire_timeout: float = POSE_ACQUIRE_TIMEOUT, **pose_options) -> None:
+        self.size = max(1, int(size))
+        self.acquire_timeout = float(acquire_timeout)
+        self.pose_options = dict(POSE_OPTIONS, **pose_options)
+        self._idle = deque()
+        self._built = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "cold_starts": 0,
+            "cold_start_s": 0.0,
+            "warm_acquires": 0,
+            "warm_acquire_s": 0.0,
+            "overflow": 0,
+            "discarded": 0,
+        }
+
+    def _build(self):
+        t0 = time.perf_counter()
+        pose = mp.solutions.pose.Pose(**self.pose_options)
+        elapsed = time.perf_counter() - t0
+        with self._cond:
+            self._stats["cold_starts"] += 1
+            self._stats["cold_start_s"] += elapsed
+        return pose
+
+    def prewarm(self, count=None) -> None:
+        """Build engines up front so the first sessions take the warm path."""
+        count = self.size if count is None else min(int(count), self.size)
+        while True:
+            with self._cond:
+                if self._built >= count:
+                    return
+                self._built += 1
+            try:
+                pose = self._build()
+            except Exception:
+                with self._cond:
+                    self._built -= 1
+                raise
+            with self._cond:
+                self._idle.append(pose)
+                self._cond.notify()
+
+    def acquire(self, timeout=None) -> PoseLease:
+        timeout = self.acquire_timeout if timeout is None else timeout
+        t0 = time.perf_counter()
+        deadline = t0 + timeout
+        with self._cond:
+            while not self._idle and self._built >= self.size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            if self._idle:
+                pose = self._idle.popleft()
+                elapsed = time.perf_counter() - t0
+                self._stats["warm_acquires"] += 1
+                self._stats["warm_acquire_s"] += elapsed
+                return PoseLease(pose, cold=False, acquire_s=elapsed, pooled=True)
+            pooled = self._built < self.size
+            if pooled:
+                self._built += 1
+            else:
+                # Every engine is busy: serve this session from a throwaway graph
+                # instead of stalling it behind someone else's video.
+                self._stats["overflow"] += 1
+        try:
+            pose = self._build()
+        except Exception:
+            if pooled:
+                with self._cond:
+                    self._built -= 1
+                    self._cond.notify()
+            raise
+        return PoseLease(pose, cold=True, acquire_s=time.perf_counter() - t0, pooled=pooled)
+
+    def release(self, lease: PoseLease) -> None:
+        if not lease.pooled:
+            lease.pose.close()
+            return
+        try:
+            # Drop the tracking state of the previous session.
+            lease.pose.reset()
+        except Exception:
+            self._discard(lease.pose)
+            return
+        with self._cond:
+            self._idle.append(lease.pose)
+            self._cond.notify()
+
+    def _discard(self, pose) -> None:
+        try:
+            pose.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._built -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+
+    def health_check(self) -> bool:
+        """Run a blank inference on every idle engine and drop broken ones."""
+        with self._cond:
+            engines = list(self._idle)
+            self._idle.clear()
+        healthy = True
+        blank = np.zeros((64, 64, 3), dtype=np.uint8)
+        for pose in engines:
+            try:
+                pose.process(blank)
+                pose.reset()
+            except Exception:
+                healthy = False
+                self._discard(pose)
+                continue
+            with self._cond:
+                self._idle.append(pose)
+                self._cond.notify()
+        return healthy
+
+    def stats(self) -> dict:
+        with self._cond:
+            s = dict(self._stats)
+            idle = len(self._idle)
+            built = self._built
+        return {
+            "size": self.size,
+            "built": built,
+            "idle": idle,
+            "in_use": built - idle,
+            "cold_starts": s["cold_starts"],
+            "cold_start_ms_avg": round(1000.0 * s["cold_start_s"] / s["cold_starts"], 2) if s["cold_starts"] else None,
+            "warm_acquires": s["warm_acquires"],
+            "warm_acquire_ms_avg": round(1000.0 * s["warm_acquire_s"] / s["warm_acquires"], 3) if s["warm_acquires"] else None,
+            "overflow": s["overflow"],
+            "discarded": s["discarded"],
+        }
+
+    def close(self) -> None:
+        with self._cond:
+            engines = list(self._idle)
+            self._idle.clear()
+            self._built -= len(engines)
+        for pose in engines:
+            pose.close()
+
+
+_default_pools = {}
+_default_lock = threading.Lock()
+
+
+def get_pool(model_complexity: int = 1) -> PosePool:
+    """Process-wide pool of one model complexity, used by counters that are not given one explicitly."""
+    with _default_lock:
+        pool = _default_pools.get(model_complexity)
+        if pool is None:
+            pool = _default_pools[model_complexity] = PosePool(model_complexity=model_complexity)
+        return pool
+
+
+def default_pools():
+    """The process-wide pools created so far."""
+    with _default_lock:
+        return list(_default_pools.values())
@@ -0,0 +1,185 @@
+# quality.py
+# Load-aware quality tiers for pose inference.
+#
+# Under load it is better to serve everyone with a slightly lighter model than
+# to let half the requests time out. A tier is a MediaPipe model_complexity
+# plus a cap on the inference resolution; a QualityController picks one per
+# job or live frame from two signals:
+#
+#   - backlog: every QUALITY_QUEUE_STEP items waiting drops one tier, so a
+#     burst is absorbed immediately,
+#   - latency: an EWMA of observed latency above the SLO drops one tier, and
+#     below QUALITY_RESTORE_RATIO of it restores one, at most once per
+#     QUALITY_COOLDOWN_S so the tier does not flap.
+#
+# With no backlog and nothing observed for a cooldown the controller also
+# steps back up, so an idle server returns to full quality. Results record the
+# tier that produced them.
+#
+# MediaPipe downloads the lite and heavy models on first use, so workers load
+# every configured tier's model at startup (see prewarm_tiers) rather than in
+# the middle of a peak. Tiers whose model could not be loaded are taken out of
+# the controller (exclude_model), so load never moves work onto a model that
+# is not there; QUALITY_FLOOR_TIER=reduced avoids the lite model altogether.
+
+import os
+import time
+import logging
+import threading
+
+from inference_policy import InferencePolicy
+
+logger = logging.getLogger(__name__)
+
+
+class Tier:
+    def __init__(self, name: str, model_complexity: int, max_dim=None) -> None:
+        self.name = name
+        self.model_complexity = int(model_complexity)
+        self.max_dim = int(max_dim) if max_dim else None
+
+    def apply(self, policy: InferencePolicy) -> InferencePolicy:
+        """`policy` with this tier's model and resolution cap (the lower cap wins)."""
+        caps = [d for d in (policy.max_dim, self.max_dim) if d]
+        return InferencePolicy(
+            target_fps=policy.target_fps,
+            max_dim=min(caps) if caps else None,
+            adaptive=policy.adaptive,
+            model_complexity=self.model_complexity,
+        )
+
+    def to_dict(self) -> dict:
+        return {"tier": self.name, "model_complexity": self.model_complexity, "max_dim": self.max_dim}
+
+
+# Best first. "high" needs MediaPipe's heavy model, so it is opt-in via QUALITY_TOP_TIER.
+TIERS = (
+    Tier("high", 2),
+    Tier("standard", 1),
+    Tier("reduced", 1, 640),
+    Tier("light", 0, 480),
+)
+TIERS_BY_NAME = {t.name: t for t in TIERS}
+
+QUALITY_TOP_TIER = os.environ.get("QUALITY_TOP_TIER", "standard")
+QUALITY_FLOOR_TIER = os.environ.get("QUALITY_FLOOR_TIER", "light")
+QUALITY_QUEUE_STEP = int(os.environ.get("QUALITY_QUEUE_STEP", 2))
+QUALITY_COOLDOWN_S = float(os.environ.get("QUALITY_COOLDOWN_S", 5))
+QUALITY_RESTORE_RATIO = float(os.environ.get("QUALITY_RESTORE_RATIO", 0.5))
+
+
+def configured_tiers(top: str = QUALITY_TOP_TIER, floor: str = QUALITY_FLOOR_TIER):
+    """Tiers from `top` down to `floor`, best first."""
+    names = [t.name for t in TIERS]
+    tiers = TIERS[names.index(top):names.index(floor) + 1]
+    if not tiers:
+        raise ValueError(f"Quality tier {top} is below floor {floor}")
+    return tiers
+
+
+def prewarm_tiers() -> list:
+    """Load one engine of every model complexity the configured tiers use.
+
+    Returns the model complexities that could not be loaded.
+    """
+    from pose_pool import get_pool
+    failed = []
+    for complexity in sorted({t.model_complexity for t in configured_tiers()}):
+        try:
+            get_pool(complexity).prewarm(1)
+        except Exception as e:
+            logger.warning("Quality: could not load the model_complexity=%d model: %s", complexity, e)
+            failed.append(complexity)
+    return failed
+
+
+def get_tier(name) -> Tier:
+    """Tier by name; None gives the top tier."""
+    if name is None:
+        return TIERS_BY_NAME[QUALITY_TOP_TIER]
+    if name not in TIERS_BY_NAME:
+        raise ValueError(f"Unknown quality tier: {name}")
+    return TIERS_BY_NAME[name]
+
+
+class QualityController:
+    def __init__(self, slo: float, top: str = QUALITY_TOP_TIER, floor: str = QUALITY_FLOOR_TIER,
+                 queue_step: int = QUALITY_QUEUE_STEP, cooldown: float = QUALITY_COOLDOWN_S,
+                 restore_ratio: float = QUALITY_RESTORE_RATIO, alpha: float = 0.2) -> None:
+        self.tiers = configured_tiers(top, floor)
+        self.slo = float(slo)
+        self.queue_step = int(queue_step)
+        self.cooldown = float(cooldown)
+        self.restore_ratio = float(restore_ratio)
+        self.alpha = float(alpha)
+        self._lock = threading.Lock()
+        self._latency = None
+        self._level = 0
+        self._changed_at = 0.0
+        self._observed_at = 0.0
+        self.chosen = {t.name: 0 for t in self.tiers}
+
+    def exclude_model(self, model_complexity: int) -> None:
+        """Stop choosing tiers that use `model_complexity`, e.g. because it failed to load.
+
+        Raises RuntimeError if no tier would be left.
+        """
+        with self._lock:
+            current = self.tiers[self._level]
+            tiers = tuple(t for t in self.tiers if t.model_complexity != int(model_complexity))
+            if not tiers:
+                raise RuntimeError(f"No quality tier left without the model_complexity={model_complexity} model")
+            if len(tiers) == len(self.tiers):
+                return
+            # Stay at the nearest remaining tier at or above the current one.
+            rank = [t.name for t in TIERS]
+            self._level = max([0] + [i for i, t in enumerate(tiers) if rank.index(t.name) <= rank.index(current.name)])
+            self.tiers = tiers
+        logger.info("Quality: tiers without the model_complexity=%d model: %s.",
+                    model_complexity, ", ".join(t.name for t in tiers))
+
+    def _step(self, delta: int, now: float) -> None:
+        level = max(0, min(len(self.tiers) - 1, self._level + delta))
+        if level != self._level:
+            self._level = level
+            self._changed_at = now
+            logger.info("Quality: latency-driven tier is now %s.", self.tiers[level].name)
+
+    def observe(self, latency: float) -> None:
+        """Feed one observed latency, in the same unit as the SLO."""
+        now = time.monotonic()
+        with self._lock:
+            if self._latency is None:
+                self._latency = float(latency)
+            else:
+                self._latency = self.alpha * float(latency) + (1.0 - self.alpha) * self._latency
+            self._observed_at = now
+            if now - self._changed_at < self.cooldown:
+                return
+            if self._latency > self.slo:
+                self._step(1, now)
+            elif self._latency < self.slo * self.restore_ratio:
+                self._step(-1, now)
+
+    def choose(self, queue_depth: int = 0) -> Tier:
+        """Tier for the next job or frame, given how many items are waiting."""
+        now = time.monotonic()
+        with self._lock:
+            idle = now - max(self._observed_at, self._changed_at) >= self.cooldown
+            if queue_depth <= 0 and self._level > 0 and idle:
+                self._latency = None
+                self._step(-1, now)
+            backlog = queue_depth // self.queue_step if self.queue_step > 0 else 0
+            tier = self.tiers[min(len(self.tiers) - 1, max(self._level, backlog))]
+            self.chosen[tier.name] += 1
+        return tier
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tiers": [t.to_dict() for t in self.tiers],
+                "latency_tier": self.tiers[self._level].name,
+                "latency_ewma": round(self._latency, 4) if self._latency is not None else None,
+                "slo": self.slo,
+                "chosen": dict(self.chosen),
+            }
@@ -0,0 +1,160 @@
+# rep_analysis.py
+# Offline rep analysis over a whole landmark time series.
+#
+# For uploaded videos every frame's landmarks are known before counting starts,
+# so the per-frame Python work of SitupCounter/JumpCounter (angle, smoothing,
+# velocity, state machine) can be done with array operations on a
+# (frames, 33, 4) stack from landmarks.py. Results match the streaming counters
+# exactly: every float op is evaluated in the same order, and the EMA recursion
+# runs as a ufunc accumulate because a closed form would round differently.
+
+import numpy as np
+
+from landmarks import (
+    LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, valid_mask,
+)
+
+# JumpCounter timing (shared with counters.py), in source frames: the
+# calibration window, the hip velocities (pixels per frame, downwards
+# positive) of take-off and landing, and the hip smoothing (moving-average
+# window and EMA weight of one new frame).
+CALIBRATION_FRAMES = 60
+TAKE_OFF_VELOCITY = -2.0
+LANDING_VELOCITY = 0.5
+HIP_HISTORY_FRAMES = 5
+HIP_EMA_ALPHA = 0.4
+
+
+def jump_smoothing(frame_step: int = 1, alpha: float = HIP_EMA_ALPHA):
+    """(hip history length, hip EMA alpha) covering the same source frames at `frame_step`."""
+    if frame_step <= 1:
+        return HIP_HISTORY_FRAMES, alpha
+    # One update then stands for frame_step frames of decay.
+    return -(-HIP_HISTORY_FRAMES // frame_step), 1.0 - (1.0 - alpha) ** frame_step
+
+
+def ema(values, alpha: float):
+    """EMASmoother.smooth applied over a 1-D series, bit-for-bit."""
+    if len(values) == 0:
+        return np.empty(0, dtype=np.float64)
+    beta = 1.0 - alpha
+    step = np.frompyfunc(lambda prev, new: alpha * new + beta * prev, 2, 1)
+    return step.accumulate(np.asarray(values, dtype=np.float64).astype(object)).astype(np.float64)
+
+
+def angles(a, b, c):
+    """calculate_angle over (n, 2) arrays of points, in degrees."""
+    radians = np.arctan2(c[:, 1] - b[:, 1], c[:, 0] - b[:, 0]) - np.arctan2(a[:, 1] - b[:, 1], a[:, 0] - b[:, 0])
+    angle = np.abs(radians * 180.0 / np.pi)
+    return np.where(angle > 180.0, 360.0 - angle, angle)
+
+
+def _first_at_or_after(candidates, start):
+    i = np.searchsorted(candidates, start)
+    return int(candidates[i]) if i < len(candidates) else None
+
+
+# --- Sit-ups ---
+def situp_angles(landmarks):
+    """Hip angle of every valid frame, using the more visible body side."""
+    lm = landmarks[valid_mask(landmarks)].astype(np.float64)
+    vis = lm[:, :, 3]
+    left_vis = (vis[:, LEFT_SHOULDER] + vis[:, LEFT_HIP] + vis[:, LEFT_KNEE]) / 3
+    right_vis = (vis[:, RIGHT_SHOULDER] + vis[:, RIGHT_HIP] + vis[:, RIGHT_KNEE]) / 3
+    use_left = (left_vis >= right_vis)[:, None]
+    shoulder = np.where(use_left, lm[:, LEFT_SHOULDER, :2], lm[:, RIGHT_SHOULDER, :2])
+    hip = np.where(use_left, lm[:, LEFT_HIP, :2], lm[:, RIGHT_HIP, :2])
+    knee = np.where(use_left, lm[:, LEFT_KNEE, :2], lm[:, RIGHT_KNEE, :2])
+    return angles(shoulder, hip, knee)
+
+
+def analyze_situps(landmarks, alpha: float = 0.15) -> dict:
+    """SitupCounter's final count/stage/angle for a (frames, 33, 4) stack."""
+    raw = situp_angles(landmarks)
+    smoothed = ema(raw, alpha)
+    # The stage is a hysteresis between the two thresholds: it follows the
+    # last threshold crossed, starting from "up".
+    marks = np.where(smoothed < 90, 1, np.where(smoothed > 150, 2, 0))
+    crossed = np.flatnonzero(marks)
+    stages = np.concatenate(([2], marks[crossed]))
+    count = int(np.count_nonzero((stages[1:] == 2) & (stages[:-1] == 1)))
+    last_valid = len(landmarks) > 0 and bool(valid_mask(landmarks[-1:])[0])
+    return {
+        "count": count,
+        "stage": "down" if stages[-1] == 1 else "up",
+        "angle": float(raw[-1]) if last_valid else None,
+    }
+
+
+# --- Jumps ---
+def analyze_jumps(landmarks, frame_height: int, frame_step: int = 1, alpha: float = HIP_EMA_ALPHA) -> dict:
+    """JumpCounter's final count/state/last jump height for a (frames, 33, 4) stack.
+
+    frame_step: source frames between two rows, as in JumpCounter.set_frame_step.
+    """
+    frame_step = max(1, int(frame_step))
+    calibration_frames = -(-CALIBRATION_FRAMES // frame_step)
+    window, alpha = jump_smoothing(frame_step, alpha)
+    lm = landmarks[valid_mask(landmarks)].astype(np.float64)
+    n = len(lm)
+    hip_raw = ((lm[:, LEFT_HIP, 1] + lm[:, RIGHT_HIP, 1]) / 2.0) * frame_height
+    shoulder_raw = ((lm[:, LEFT_SHOULDER, 1] + lm[:, RIGHT_SHOULDER, 1]) / 2.0) * frame_height
+
+    # Mean over the last `window` hip samples, summed oldest first like np.mean on the deque.
+    hip = np.zeros(n)
+    for lag in range(window - 1, -1, -1):
+        hip[lag:] += hip_raw[:n - lag] if lag else hip_raw
+    hip /= np.minimum(np.arange(1, n + 1), window)
+
+    if n <= calibration_frames:
+        return {"count": 0, "state": "CALIBRATING", "last_jump_cm": 0.0}
+
+    standing_y_hip = float(np.mean(hip[:calibration_frames])) if calibration_frames else float(hip[0])
+    standing_y_shoulder = float(np.mean(shoulder_raw[:calibration_frames])) if calibration_frames else float(shoulder_raw[0])
+    torso_height_pixels = abs(standing_y_hip - standing_y_shoulder)
+    pixels_to_cm_ratio = 50.0 / torso_height_pixels if torso_height_pixels > 0 else 1.0
+    crouch_threshold = standing_y_hip + (10.0 / pixels_to_cm_ratio)
+
+    start = calibration_frames
+    hip_c = hip[start:]
+    previous = np.concatenate(([standing_y_hip], hip_c[:-1]))
+    velocity = ema(hip_c, alpha) - previous
+
+    crouch = np.flatnonzero(hip_c > crouch_threshold)
+    take_off = np.flatnonzero(velocity < TAKE_OFF_VELOCITY * frame_step)
+    landing = np.flatnonzero(velocity > LANDING_VELOCITY * frame_step)
+
+    # Walk the state machine event to event instead of frame to frame. A
+    # state entered on frame i is only left on a later frame.
+    count = 0
+    last_jump_height_cm = 0.0
+    state = "IDLE"
+    i = 0
+    while True:
+        j = _first_at_or_after(crouch, i)
+        if j is None:
+            break
+        state = "CROUCHING"
+        k = _first_at_or_after(take_off, j + 1)
+        if k is None:
+            break
+        state = "JUMPING"
+        m = _first_at_or_after(landing, k + 1)
+        if m is None:
+            break
+        peak = float(np.min(hip_c[k:m + 1]))
+        last_jump_height_cm = (standing_y_hip - peak) * pixels_to_cm_ratio
+        count += 1
+        state = "IDLE"
+        i = m + 1
+
+    return {"count": count, "state": state, "last_jump_cm": round(float(last_jump_height_cm), 1)}
+
+
+def analyze(kind: str, landmarks, frame_height: int, frame_step: int = 1) -> dict:
+    """Final counter info for `kind`; frame_step as in BaseCounter.set_frame_step."""
+    if kind == "situp":
+        return analyze_situps(landmarks)
+    if kind == "jump":
+        return analyze_jumps(landmarks, frame_height, frame_step)
+    raise ValueError(f"Unknown exercise kind: {kind}")
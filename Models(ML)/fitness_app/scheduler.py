@@ -0,0 +1,362 @@
+# scheduler.py
+# Shared inference scheduler for live sessions.
+#
+# Every live session used to run its own inference on its own Pose graph, so
+# N connections meant N graphs fighting over the CPU and a client pushing 30
+# fps could starve one pushing 10. Here a fixed set of worker threads, each
+# holding one Pose engine, serves all sessions:
+#
+#   - each session has at most one pending frame; a newer one replaces it
+#     (superseded) and one that waited longer than STALE_FRAME_MS is dropped
+#     (stale) rather than analysed late,
+#   - sessions are served round-robin and at most max_fps times a second,
+#     so a fast client gets its budget and no more,
+#   - frames of one session are analysed one at a time and in order, since
+#     its counter carries state from frame to frame,
+#   - because of the fps cap and the dropped frames, consecutive analysed
+#     frames are usually several camera frames apart; each session's counter
+#     is told how many (see ScheduledSession.frame_step), so frame-counted
+#     thresholds keep their meaning in time.
+#
+# MediaPipe tracks the pose from one frame to the next, so each session keeps
+# the engine it was first served with for as long as it is open: round-robin
+# between sessions never resets tracking. Pools keep SCHEDULER_ENGINES engines
+# per model complexity; sessions beyond that get a throwaway engine.
+# Achieved fps and latency are tracked per session and in total; the total
+# at full load is the node's live capacity.
+#
+# Each frame is analysed at the quality tier (model complexity and input
+# size, see quality.py) that the backlog of waiting sessions and the recent
+# latency against QUALITY_LIVE_SLO_MS call for. A session holds one engine per
+# model complexity it has been served at, borrowed from one pool per complexity.
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+
+import cv2
+import numpy as np
+
+from metrics import REGISTRY
+from pose_pool import PosePool
+from quality import QualityController
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_WORKERS = int(os.environ.get("SCHEDULER_WORKERS", 1))
+SCHEDULER_ENGINES = int(os.environ.get("SCHEDULER_ENGINES", 4))
+SESSION_MAX_FPS = float(os.environ.get("SESSION_MAX_FPS", 15))
+STALE_FRAME_SECONDS = float(os.environ.get("STALE_FRAME_MS", 1000)) / 1000.0
+# Camera rate the counters' frame-counted thresholds are tuned for.
+LIVE_SOURCE_FPS = float(os.environ.get("LIVE_SOURCE_FPS", 30))
+QUALITY_LIVE_SLO = float(os.environ.get("QUALITY_LIVE_SLO_MS", 250)) / 1000.0
+# Completions and latencies kept per session for the rolling fps and percentiles.
+STATS_WINDOW = 100
+
+LIVE_FRAMES = REGISTRY.counter(
+    "fitness_live_frames_total", "Live frames by outcome (processed, superseded, stale, error).", ["outcome"],
+)
+LIVE_LATENCY_SECONDS = REGISTRY.histogram(
+    "fitness_live_latency_seconds", "Time from receiving a live frame until its result is ready.",
+)
+
+
+def _percentile(values, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ScheduledSession:
+    """One live connection as seen by the scheduler.
+
+    Results are handed back to the event loop the session was opened on.
+    """
+
+    def __init__(self, session_id: int, kind: str, counter, max_fps: float, loop) -> None:
+        self.session_id = session_id
+        self.kind = kind
+        self.counter = counter
+        self.interval = 1.0 / max_fps
+        self.max_fps = max_fps
+        self.loop = loop
+        self.results = asyncio.Queue()
+        self.pending = None
+        self.busy = False
+        # model_complexity -> PoseLease, tracking this session's video only.
+        self.engines = {}
+        self.next_due = 0.0
+        self._last_received = None
+        self._interval = None
+        self.opened_at = time.perf_counter()
+        self.received = 0
+        self.processed = 0
+        self.superseded = 0
+        self.stale = 0
+        self._completed = deque(maxlen=STATS_WINDOW)
+        self._latencies = deque(maxlen=STATS_WINDOW)
+
+    @property
+    def dropped(self) -> int:
+        return self.superseded + self.stale
+
+    def frame_step(self, received_at: float, max_gap: float) -> int:
+        """Camera frames (at LIVE_SOURCE_FPS) since the previous analysed frame.
+
+        Measured from when the frames arrived, smoothed against network
+        jitter. Gaps over `max_gap` are pauses rather than a frame rate and
+        are left out.
+        """
+        if self._last_received is not None:
+            gap = received_at - self._last_received
+            if 0 < gap <= max_gap:
+                self._interval = gap if self._interval is None else 0.8 * self._interval + 0.2 * gap
+        self._last_received = received_at
+        if self._interval is None:
+            return 1
+        return max(1, int(round(self._interval * LIVE_SOURCE_FPS)))
+
+    def analyze(self, data: bytes, pose, max_dim=None, frame_step: int = 1) -> dict:
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("Could not decode frame")
+        self.counter.set_frame_step(frame_step)
+        _, info = self.counter.process_frame(frame, render=False, max_dim=max_dim, pose=pose)
+        return info
+
+    def deliver(self, result) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self.results.put_nowait, result)
+        except RuntimeError:
+            pass  # the connection's event loop is gone
+
+    def stats(self) -> dict:
+        window = list(self._completed)
+        fps = None
+        if len(window) > 1 and window[-1] > window[0]:
+            fps = round((len(window) - 1) / (window[-1] - window[0]), 2)
+        latencies = list(self._latencies)
+        p50 = _percentile(latencies, 0.5)
+        p99 = _percentile(latencies, 0.99)
+        return {
+            "session_id": self.session_id,
+            "kind": self.kind,
+            "max_fps": self.max_fps,
+            "achieved_fps": fps,
+            "latency_ms_p50": round(1000.0 * p50, 1) if p50 is not None else None,
+            "latency_ms_p99": round(1000.0 * p99, 1) if p99 is not None else None,
+            "received": self.received,
+            "processed": self.processed,
+            "superseded": self.superseded,
+            "stale": self.stale,
+            "frame_step": self.counter.frame_step,
+            "age_s": round(time.perf_counter() - self.opened_at, 1),
+        }
+
+
+class InferenceScheduler:
+    def __init__(self, workers: int = SCHEDULER_WORKERS, max_fps: float = SESSION_MAX_FPS,
+                 stale_after: float = STALE_FRAME_SECONDS, slo: float = QUALITY_LIVE_SLO,
+                 engines: int = SCHEDULER_ENGINES) -> None:
+        self.workers = max(1, int(workers))
+        self.engines = max(self.workers, int(engines))
+        self.max_fps = float(max_fps)
+        self.stale_after = float(stale_after)
+        self.quality = QualityController(slo=slo)
+        self._pools = {}
+        # Insertion order is the round-robin order; a served session moves to the back.
+        self._sessions = OrderedDict()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopping = False
+        self._next_id = 0
+        self._started = None
+        self._busy_s = 0.0
+        self._completed = deque(maxlen=STATS_WINDOW)
+
+    # --- Lifecycle ---
+    def _pool(self, model_complexity: int) -> PosePool:
+        with self._cond:
+            pool = self._pools.get(model_complexity)
+            if pool is None:
+                pool = self._pools[model_complexity] = PosePool(size=self.engines, model_complexity=model_complexity)
+            return pool
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        # Full quality is what an idle node serves, so all of those engines are
+        # built up front; lighter models get one each so they are loaded before a peak.
+        # A lighter model that cannot be loaded takes its tiers out of the ladder;
+        # without the top model the scheduler does not start.
+        top = self.quality.tiers[0].model_complexity
+        self._pool(top).prewarm(self.workers)
+        for complexity in sorted({t.model_complexity for t in self.quality.tiers} - {top}):
+            try:
+                self._pool(complexity).prewarm(1)
+            except Exception as e:
+                logger.warning("Quality: could not load the model_complexity=%d model: %s", complexity, e)
+                self.quality.exclude_model(complexity)
+        self._stopping = False
+        self._started = time.perf_counter()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"inference-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def warm_up(self) -> bool:
+        """Run a blank inference on every idle engine; False if one of them failed."""
+        with self._cond:
+            pools = list(self._pools.values())
+        return all([pool.health_check() for pool in pools])
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        with self._cond:
+            sessions = list(self._sessions.values())
+        for session in sessions:
+            self._release_engines(session)
+        for pool in self._pools.values():
+            pool.close()
+
+    # --- Sessions (called from the event loop) ---
+    def open(self, kind: str, counter, max_fps=None) -> ScheduledSession:
+        """Register a session; max_fps is capped at the scheduler's budget."""
+        fps = self.max_fps if not max_fps or max_fps <= 0 else min(float(max_fps), self.max_fps)
+        with self._cond:
+            self._next_id += 1
+            session = ScheduledSession(self._next_id, kind, counter, fps, asyncio.get_running_loop())
+            self._sessions[session.session_id] = session
+        return session
+
+    def close(self, session: ScheduledSession) -> None:
+        with self._cond:
+            self._sessions.pop(session.session_id, None)
+            session.pending = None
+            # A worker may still be analysing its last frame; wait so the counter is not closed under it.
+            while session.busy:
+                self._cond.wait()
+        self._release_engines(session)
+
+    def _release_engines(self, session: ScheduledSession) -> None:
+        engines, session.engines = session.engines, {}
+        for complexity, lease in engines.items():
+            self._pools[complexity].release(lease)
+
+    def submit(self, session: ScheduledSession, item) -> None:
+        """Make `item` (seq, received_at, data) the session's pending frame."""
+        with self._cond:
+            session.received += 1
+            if session.pending is not None:
+                session.superseded += 1
+                LIVE_FRAMES.inc(outcome="superseded")
+            session.pending = item
+            self._cond.notify()
+
+    # --- Workers ---
+    def _next_frame(self):
+        """Wait for the next (session, item, tier) to analyse, or None when stopping."""
+        while not self._stopping:
+            now = time.perf_counter()
+            wait = None
+            waiting = sum(1 for s in self._sessions.values() if s.pending is not None and not s.busy)
+            for session_id, session in self._sessions.items():
+                if session.busy or session.pending is None:
+                    continue
+                if now - session.pending[1] > self.stale_after:
+                    session.pending = None
+                    session.stale += 1
+                    LIVE_FRAMES.inc(outcome="stale")
+                    continue
+                if session.next_due > now:
+                    remaining = session.next_due - now
+                    wait = remaining if wait is None else min(wait, remaining)
+                    continue
+                item, session.pending = session.pending, None
+                session.busy = True
+                session.next_due = now + session.interval
+                self._sessions.move_to_end(session_id)
+                return session, item, self.quality.choose(waiting - 1)
+            self._cond.wait(wait)
+        return None
+
+    def _engine(self, session: ScheduledSession, model_complexity: int):
+        """The session's engine for `model_complexity`, borrowed on first use."""
+        lease = session.engines.get(model_complexity)
+        if lease is None:
+            # With every pooled engine held by another session, build a throwaway
+            # one at once rather than stall the worker waiting for one.
+            lease = session.engines[model_complexity] = self._pool(model_complexity).acquire(timeout=0)
+        return lease
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                job = self._next_frame()
+            if job is None:
+                return
+            session, (seq, received_at, data), tier = job
+            info = None
+            t0 = time.perf_counter()
+            try:
+                lease = self._engine(session, tier.model_complexity)
+                step = session.frame_step(received_at, self.stale_after)
+                info = session.analyze(data, lease.pose, tier.max_dim, step)
+            except Exception as e:
+                # Neither a bad frame nor an engine that fails to load may take
+                # the worker down; the session gets the error instead.
+                result = {"seq": seq, "error": str(e) or type(e).__name__}
+            finally:
+                # Always hand the session back, or close() would wait for it forever.
+                done = time.perf_counter()
+                with self._cond:
+                    session.busy = False
+                    self._busy_s += done - t0
+                    self._completed.append(done)
+                    if info is not None:
+                        session.processed += 1
+                        session._completed.append(done)
+                        session._latencies.append(done - received_at)
+                    self._cond.notify_all()
+            if info is not None:
+                LIVE_FRAMES.inc(outcome="processed")
+                LIVE_LATENCY_SECONDS.observe(done - received_at)
+                self.quality.observe(done - received_at)
+                result = dict(info)
+                result["seq"] = seq
+                result["dropped"] = session.dropped
+                result["latency_ms"] = round(1000.0 * (done - received_at), 1)
+                result["quality"] = tier.name
+            else:
+                LIVE_FRAMES.inc(outcome="error")
+            session.deliver(result)
+
+    # --- Stats ---
+    def stats(self) -> dict:
+        with self._cond:
+            sessions = [s.stats() for s in self._sessions.values()]
+            window = list(self._completed)
+            busy_s = self._busy_s
+        uptime = time.perf_counter() - self._started if self._started else 0.0
+        fps = None
+        if len(window) > 1 and window[-1] > window[0]:
+            fps = round((len(window) - 1) / (window[-1] - window[0]), 2)
+        return {
+            "workers": self.workers,
+            "max_fps_per_session": self.max_fps,
+            "stale_after_ms": round(1000.0 * self.stale_after, 1),
+            "sessions": sessions,
+            "achieved_fps": fps,
+            # Share of worker time spent analysing; near 1.0 the node is at capacity.
+            "utilization": round(busy_s / (uptime * self.workers), 3) if uptime else None,
+            "quality": self.quality.stats(),
+        }
@@ -0,0 +1,275 @@
+# segments.py
+# Intra-video parallelism: one long upload split across worker processes.
+#
+# Pose inference is independent per frame apart from MediaPipe's tracking
+# between neighbouring frames, so a long video is cut into segments that
+# worker processes analyse on their own. Each worker seeks a little before its
+# segment (the overlap) so the tracker has settled when the segment's own
+# frames start, and the overlap frames are thrown away. Only the landmarks
+# come back; they are stitched into one (frames, 33, 4) stack and the rep
+# logic runs once over it, so counts, the sit-up stage and the jump
+# calibration carry across segment boundaries as in a single pass.
+#
+# For overlay videos the stitched landmarks are replayed through the counter
+# once in the parent (no inference, so this is cheap), its state is pickled at
+# every segment start, and each worker renders its segment from that snapshot.
+# The parts are joined with ffmpeg's concat demuxer (no re-encode) when ffmpeg
+# is installed, otherwise re-encoded with OpenCV.
+#
+# Every job worker gets its own segment pool, so with SEGMENT_WORKERS > 1 keep
+# JOB_WORKERS * SEGMENT_WORKERS around the number of cores. The pool is shut
+# down when the process that made it exits (see shutdown()).
+
+import os
+import uuid
+import pickle
+import shutil
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+import multiprocessing.util
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+import landmarks
+from counters import COUNTERS, BaseCounter
+from pose_pool import get_pool
+
+SEGMENT_WORKERS = int(os.environ.get("SEGMENT_WORKERS", 1))
+# Shorter videos are not worth the extra seeks and process hand-offs.
+SEGMENT_MIN_SECONDS = float(os.environ.get("SEGMENT_MIN_SECONDS", 60))
+SEGMENT_OVERLAP_FRAMES = int(os.environ.get("SEGMENT_OVERLAP_FRAMES", 30))
+
+
+def enabled(policy, fps: float, total_frames: int) -> bool:
+    """Whether a seekable video should be processed in segments.
+
+    Adaptive sampling decides the next frame from the counter state, which is
+    only known after every earlier frame, so it always runs in one pass.
+    """
+    return (
+        SEGMENT_WORKERS > 1
+        and not policy.adaptive
+        and fps > 0
+        and total_frames >= max(2, SEGMENT_MIN_SECONDS * fps)
+    )
+
+
+def plan(total_frames: int, segments: int = SEGMENT_WORKERS):
+    """(start, end) frame spans; the last one runs to the end of the file."""
+    segments = max(1, min(int(segments), total_frames))
+    bounds = [total_frames * i // segments for i in range(segments)]
+    return [(start, end) for start, end in zip(bounds, bounds[1:] + [None])]
+
+
+# --- Worker side (runs in the segment pool processes) ---
+def _init_worker() -> None:
+    import env_setup  # noqa: F401
+    get_pool().prewarm()
+
+
+def _open_at(video_path, frame_idx):
+    cap = cv2.VideoCapture(video_path)
+    if frame_idx:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+    return cap
+
+
+def _analyze_segment(video_path, start, end, overlap, stride, max_dim, model_complexity=1):
+    """Landmarks of the analysed frames in [start, end), plus frames read there."""
+    first = max(0, start - overlap)
+    first -= first % stride  # keep the warm-up frames on the sampling grid
+    cap = _open_at(video_path, first)
+    detector = BaseCounter(get_pool(model_complexity))
+    rows = []
+    index = []
+    frame_idx = first
+    try:
+        while end is None or frame_idx < end:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_idx % stride == 0:
+                results = detector.detect(frame, max_dim)
+                if frame_idx >= start:
+                    rows.append(landmarks.to_array(results))
+                    index.append(frame_idx)
+            frame_idx += 1
+    finally:
+        cap.release()
+        detector.close()
+    return landmarks.stack(rows), np.asarray(index, dtype=np.int32), max(0, frame_idx - start)
+
+
+def _render_segment(video_path, start, end, snapshot, results_row, rows, index, part_path, fps, size):
+    counter = pickle.loads(snapshot)
+    # Frames before the segment's first analysed one keep the previous overlay.
+    results = landmarks.to_results(results_row)
+    cap = _open_at(video_path, start)
+    out = cv2.VideoWriter(part_path, cv2.VideoWriter_fourcc(*'avc1'), fps, size)
+    pos = 0
+    frame_idx = start
+    try:
+        while end is None or frame_idx < end:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if pos < len(index) and index[pos] == frame_idx:
+                results = landmarks.to_results(rows[pos])
+                counter.update(results, frame.shape)
+                pos += 1
+            out.write(counter.render(frame, results, out=frame))
+            frame_idx += 1
+    finally:
+        cap.release()
+        out.release()
+    return frame_idx - start
+
+
+# --- Parent side ---
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=SEGMENT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            # A process exiting joins its children before the executor's own
+            # exit hook tells them to stop, so a job worker that made a pool
+            # would wait on it forever; finalizers run ahead of that join.
+            multiprocessing.util.Finalize(None, shutdown, exitpriority=10)
+        return _executor
+
+
+def shutdown(timeout: float = 5.0) -> None:
+    """Stop this process's segment pool, if it made one, and its workers."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is None:
+        return
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join(timeout)
+
+
+def _run(calls, progress_cb=None, progress_span=(0.0, 1.0)):
+    """Run (fn, *args) calls on the segment pool; results in call order."""
+    executor = _get_executor()
+    futures = {executor.submit(*call): i for i, call in enumerate(calls)}
+    results = [None] * len(calls)
+    low, high = progress_span
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            if progress_cb is not None:
+                progress_cb(low + (high - low) * done / len(calls))
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    return results
+
+
+def analyze(video_path, spans, stride: int, max_dim=None, progress_cb=None, progress_span=(0.0, 1.0),
+            model_complexity: int = 1):
+    """Pose landmarks of a whole video, one segment per span in parallel.
+
+    Returns the stitched (rows, 33, 4) stack, the source frame index of every
+    row and the number of frames decoded.
+    """
+    parts = _run(
+        [(_analyze_segment, video_path, start, end, SEGMENT_OVERLAP_FRAMES, stride, max_dim, model_complexity)
+         for start, end in spans],
+        progress_cb, progress_span,
+    )
+    stacked = np.concatenate([rows for rows, _, _ in parts])
+    frame_index = np.concatenate([index for _, index, _ in parts])
+    return stacked, frame_index, sum(frames for _, _, frames in parts)
+
+
+def _snapshots(counter, spans, rows, index, frame_shape):
+    """Counter state and last analysed row at every span start, then the final info."""
+    snapshots = []
+    info = {}
+    pos = 0
+    for start, _ in spans:
+        while pos < len(index) and index[pos] < start:
+            info = counter.update_landmarks(np.asarray(rows[pos]), frame_shape)
+            pos += 1
+        snapshots.append((pickle.dumps(counter), np.asarray(rows[pos - 1]) if pos else None))
+    for row in rows[pos:]:
+        info = counter.update_landmarks(np.asarray(row), frame_shape)
+    return snapshots, info
+
+
+def render(kind, video_path, spans, rows, index, output_path, fps, size, progress_cb=None, progress_span=(0.0, 1.0),
+           frame_step=1):
+    """Write the overlay video for stitched landmarks; returns the final counter info.
+
+    frame_step: source frames between two analysed rows (see BaseCounter.set_frame_step).
+    """
+    counter = COUNTERS[kind]()
+    counter.set_frame_step(frame_step)
+    try:
+        snapshots, info = _snapshots(counter, spans, rows, index, (size[1], size[0]))
+    finally:
+        counter.close()
+
+    parts_dir = tempfile.mkdtemp(prefix=".segments-", dir=os.path.dirname(output_path) or ".")
+    try:
+        calls = []
+        part_paths = []
+        for (start, end), (snapshot, results_row) in zip(spans, snapshots):
+            lo = int(np.searchsorted(index, start))
+            hi = len(index) if end is None else int(np.searchsorted(index, end))
+            part_paths.append(os.path.join(parts_dir, f"{len(part_paths):04d}.mp4"))
+            calls.append((
+                _render_segment, video_path, start, end, snapshot, results_row,
+                np.asarray(rows[lo:hi]), np.asarray(index[lo:hi]), part_paths[-1], fps, size,
+            ))
+        _run(calls, progress_cb, progress_span)
+        concat(part_paths, output_path, fps, size)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    return info
+
+
+def concat(part_paths, output_path, fps, size) -> None:
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        list_path = os.path.join(os.path.dirname(part_paths[0]), f"{uuid.uuid4().hex}.txt")
+        with open(list_path, "w") as f:
+            f.writelines(f"file '{os.path.abspath(p)}'\n" for p in part_paths)
+        subprocess.run(
+            [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+             "-c", "copy", "-f", "mp4", output_path],
+            check=True,
+        )
+        return
+    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'avc1'), fps, size)
+    try:
+        for path in part_paths:
+            cap = cv2.VideoCapture(path)
+            try:
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    out.write(frame)
+            finally:
+                cap.release()
+    finally:
+        out.release()
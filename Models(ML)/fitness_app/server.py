@@ -1,18 +1,106 @@
+import time
+STARTED_AT = time.perf_counter()
+
 import os
 import uuid
-import tempfile
-import cv2
+import shutil
+import asyncio
+from contextlib import asynccontextmanager
 import uvicorn
-from fastapi import FastAPI, UploadFile, File, Body
+from fastapi import FastAPI, UploadFile, File, Body, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+# Video processing runs in worker processes owned by the job queue, so this
+# process never imports cv2 or mediapipe. numpy-backed modules (landmarks,
+# rep_analysis, landmark_cache) are imported by the endpoints that use them.
+from jobs import JobQueue, QueueFullError
+import hls
+from metrics import REGISTRY
+from startup import Startup
+from video_store import VideoStore
+from ingest import (
+    MAX_UPLOAD_BYTES, STREAMABLE_TYPES, STREAMABLE_SUFFIXES, UPLOAD_DIR, PipedUpload, UploadTooLarge, save_chunks,
+    save_upload_file,
+)
+
+startup = Startup("server", STARTED_AT)
+startup.record("import", time.perf_counter() - STARTED_AT)
+
+PROCESSED_DIR = "processed_videos"
+PENDING_DIR = os.path.join(PROCESSED_DIR, "pending")
+
+BASE_URL = "http://10.223.35.72:8000/"
+# Allowance for multipart boundaries and headers on top of the file itself.
+MULTIPART_OVERHEAD = 64 * 1024
+# Landmark batches are 33 * 4 float32 = 528 bytes a frame (landmarks.FRAME_BYTES,
+# not imported here so this process stays free of numpy). The default frame
+# limit is half an hour at 30 fps.
+LANDMARK_FRAME_BYTES = 528
+MAX_LANDMARK_FRAMES = int(os.environ.get("MAX_LANDMARK_FRAMES", 54000))
+MAX_LANDMARK_BYTES = LANDMARK_FRAME_BYTES * MAX_LANDMARK_FRAMES
+
+job_queue = JobQueue()
+# Overlay renders in progress for stats-only jobs, keyed by video name.
+_pending_renders = {}
+# Progressive HLS outputs still being written, keyed by stream name.
+_live_streams = {}
+video_store = VideoStore(
+    PROCESSED_DIR, PENDING_DIR, in_use=lambda name: name in _pending_renders or name in _live_streams,
+    upload_dir=UPLOAD_DIR,
+)
+
+UPLOAD_BYTES = REGISTRY.counter("fitness_upload_bytes_total", "Bytes of video uploaded.")
+REGISTRY.gauge("fitness_jobs_in_flight", "Jobs queued or running.", fn=lambda: job_queue.in_flight)
+REGISTRY.gauge("fitness_job_queue_depth", "Jobs waiting for a free worker.", fn=lambda: job_queue.queue_depth)
+REGISTRY.gauge("fitness_video_store_bytes", "Bytes of processed videos and pending sources.",
+               fn=lambda: video_store.stats()["bytes"])
+
+
+async def _warm_up_workers() -> None:
+    # Runs after startup has finished, so liveness probes are answered meanwhile.
+    try:
+        with startup.phase("job_workers"):
+            reports = await asyncio.gather(*[asyncio.wrap_future(f) for f in job_queue.warm_up()])
+        startup.details["workers"] = sorted(reports, key=lambda r: r["pid"])
+        if not all(r["healthy"] for r in reports):
+            raise RuntimeError("A job worker failed its warm-up inference")
+        # Jobs must not be sent to a tier whose model a worker could not load.
+        for complexity in sorted({c for r in reports for c in r["unavailable_models"]}):
+            job_queue.quality.exclude_model(complexity)
+        startup.mark_ready()
+    except Exception as e:
+        startup.fail(e)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    with startup.phase("job_queue"):
+        job_queue.start()
+    with startup.phase("video_store"):
+        video_store.start()
+    warm_up = asyncio.create_task(_warm_up_workers())
+    yield
+    warm_up.cancel()
+    video_store.shutdown()
+    job_queue.shutdown()
 
-# Import your logic classes from your other file
-from counters import SitupCounter, JumpCounter
 
 # --- FastAPI Application Setup ---
-app = FastAPI(title="Fitness AI Trainer")
-os.makedirs("processed_videos", exist_ok=True)
+app = FastAPI(title="Fitness AI Trainer", lifespan=lifespan)
+os.makedirs(PROCESSED_DIR, exist_ok=True)
+
+
+# Reject oversized uploads from their Content-Length, before the body is read.
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    length = request.headers.get("content-length")
+    if request.method == "POST" and length and length.isdigit() and int(length) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD:
+        return _too_large_response(UploadTooLarge(MAX_UPLOAD_BYTES))
+    return await call_next(request)
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -22,50 +110,78 @@ app.add_middleware(
 )
 
 # --- Endpoint to Serve the Processed Videos ---
-@app.get("/get_video/{video_name}")
-def get_video(video_name: str):
-    video_path = os.path.join("processed_videos", video_name)
-    if os.path.exists(video_path):
-        return FileResponse(video_path, media_type="video/mp4")
-    return {"error": "File not found"}
-
-
-# --- Simplified, Reliable Video Processing Function ---
-def process_video_with_counter(video_path, counter_instance, base_url):
-    cap = cv2.VideoCapture(video_path)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-
-    output_filename = f"{uuid.uuid4()}.mp4"
-    output_path = os.path.join("processed_videos", output_filename)
-    
-    fourcc = cv2.VideoWriter_fourcc(*'avc1')
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-    
-    final_info = {}
-    try:
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            processed_frame, info = counter_instance.process_frame(frame)
-            final_info = info
-            out.write(processed_frame)
-    finally:
-        print("Releasing video resources.")
-        cap.release()
-        out.release()
-        counter_instance.close()
-
-    # --- NEW: Add placeholder metrics to the response ---
-    # TODO: Connect these to your actual model's output in counters.py
-    final_info["consistency_score"] = 0.85 
-    final_info["average_depth_angle"] = 45.3
-
-    final_info["processed_video_url"] = f"{base_url}get_video/{output_filename}"
-    return final_info
+# Supports Range (206) for seeking and If-None-Match (304) for revalidation.
+# Index misses stat the disk, so lookups run in the threadpool.
+@app.api_route("/get_video/{video_name}", methods=["GET", "HEAD"])
+async def get_video(video_name: str, request: Request):
+    entry = await run_in_threadpool(video_store.get, video_name)
+    if entry is None and await run_in_threadpool(video_store.is_pending, video_name):
+        # Stats-only job: render the overlay video the first time it is requested.
+        # HEAD and If-None-Match probes only learn that it is not rendered yet;
+        # a plain GET starts the render.
+        if request.method == "HEAD" or "if-none-match" in request.headers:
+            return JSONResponse(status_code=202, content={"status": "pending"})
+        try:
+            await _render_pending(video_name)
+        except QueueFullError as e:
+            return _queue_full_response(e)
+        except Exception as e:
+            return JSONResponse(status_code=500, content={"error": str(e) or type(e).__name__})
+        entry = await run_in_threadpool(video_store.add, video_name)
+    if entry is None:
+        return JSONResponse(status_code=404, content={"error": "File not found"})
+    return video_store.response(entry, request.headers, head=request.method == "HEAD")
+
+
+# --- Progressive (HLS) Output ---
+# Playlist and segments of jobs submitted with hls=true, served while the job
+# is still writing them.
+@app.api_route("/hls/{stream_name}/{file_name}", methods=["GET", "HEAD"])
+def get_hls(stream_name: str, file_name: str, request: Request):
+    entry = video_store.get_stream(stream_name)
+    response = None
+    if entry is not None:
+        response = video_store.stream_response(entry, file_name, request.headers, head=request.method == "HEAD")
+    if response is None:
+        return JSONResponse(status_code=404, content={"error": "File not found"})
+    return response
+
+
+def _open_stream():
+    """Name of a new HLS output whose (empty) playlist can be fetched right away."""
+    name = f"{uuid.uuid4()}{hls.HLS_SUFFIX}"
+    hls.create(os.path.join(PROCESSED_DIR, name))
+    return name
+
+
+def _track_stream(job, name) -> None:
+    _live_streams[name] = job
+
+    def done(_):
+        _live_streams.pop(name, None)
+        if job.status == "cancelled":
+            shutil.rmtree(os.path.join(PROCESSED_DIR, name), ignore_errors=True)
+        else:
+            video_store.add(name)
+
+    job.future.add_done_callback(done)
+
+
+def _accepted(job, stream_name=None):
+    body = {"job_id": job.job_id, "status": job.status, "queue_depth": job_queue.queue_depth}
+    if stream_name is not None:
+        body["playlist_url"] = hls.playlist_url(BASE_URL, stream_name)
+    return body
+
+
+async def _render_pending(video_name: str):
+    job = _pending_renders.get(video_name)
+    if job is None:
+        job = job_queue.submit_render(video_name, BASE_URL)
+        _pending_renders[video_name] = job
+        job.future.add_done_callback(lambda _: _pending_renders.pop(video_name, None))
+    await asyncio.wrap_future(job.future)
+    return job.result
 
 
 # --- NEW: Endpoint to Generate Detailed Feedback ---
@@ -86,26 +202,247 @@ async def generate_feedback(stats: dict = Body(...)):
     return {"feedback": simulated_ai_response}
 
 
-# --- API Prediction Endpoints (Unchanged) ---
+# --- Job Queue Helpers ---
+def _too_large_response(e: UploadTooLarge, job=None):
+    content = {"error": str(e), "max_bytes": e.max_bytes}
+    if job is not None:
+        content.update(job_id=job.job_id, status=job.status)
+    return JSONResponse(status_code=413, content=content)
+
+
+def _queue_full_response(e: QueueFullError):
+    return JSONResponse(
+        status_code=429,
+        content={"error": "Server busy, try again later", "queue_depth": e.queue_depth},
+        headers={"Retry-After": "5"},
+    )
+
+
+async def _submit(kind: str, file: UploadFile, render: bool = True, profile: bool = False, stream_name=None):
+    if job_queue.full:
+        raise QueueFullError(job_queue.queue_depth)
+    upload = await save_upload_file(file)
+    UPLOAD_BYTES.inc(upload.size)
+    try:
+        job = job_queue.submit(
+            kind, upload.path, BASE_URL, render=render, digest=upload.digest, profile=profile,
+            output_filename=stream_name,
+        )
+    except QueueFullError:
+        os.remove(upload.path)
+        raise
+    if stream_name is not None:
+        _track_stream(job, stream_name)
+    return job
+
+
+# --- Job Endpoints ---
+# render=false runs pose inference and counting only; the overlay video behind
+# processed_video_url is rendered lazily on its first /get_video request.
+# hls=true writes the overlay as a progressive HLS stream instead: the reply
+# carries its playlist_url at once, and GET /jobs/{id} shows the running
+# counts under "live" while segments are added. It implies render=true.
+# profile=true adds a sampling profile of the worker to the result.
+@app.post("/jobs", status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    kind: str = Query("situp", pattern="^(situp|jump)$"),
+    render: bool = Query(True),
+    hls: bool = Query(False),
+    profile: bool = Query(False),
+):
+    stream_name = _open_stream() if hls else None
+    try:
+        job = await _submit(kind, file, render or hls, profile, stream_name)
+    except (QueueFullError, UploadTooLarge) as e:
+        if stream_name is not None:
+            shutil.rmtree(os.path.join(PROCESSED_DIR, stream_name), ignore_errors=True)
+        if isinstance(e, QueueFullError):
+            return _queue_full_response(e)
+        return _too_large_response(e)
+    return _accepted(job, stream_name)
+
+
+# Raw request body instead of multipart, e.g. Content-Type: video/mp2t. The
+# body goes to disk chunk by chunk; for streamable containers it is also piped
+# to an idle worker so decoding starts with the first chunks.
+@app.post("/jobs/stream", status_code=202)
+async def create_stream_job(
+    request: Request,
+    kind: str = Query("situp", pattern="^(situp|jump)$"),
+    render: bool = Query(True),
+    hls: bool = Query(False),
+    profile: bool = Query(False),
+):
+    if job_queue.full:
+        return _queue_full_response(QueueFullError(job_queue.queue_depth))
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    stream_name = _open_stream() if hls else None
+    try:
+        if content_type in STREAMABLE_TYPES and job_queue.idle_workers > 0:
+            piped = PipedUpload(STREAMABLE_SUFFIXES[content_type])
+            try:
+                job = job_queue.submit(
+                    kind, piped.pipe_path, BASE_URL, render=render or hls,
+                    source_path=piped.spool_path, cleanup=[piped.directory], profile=profile,
+                    output_filename=stream_name,
+                )
+            except QueueFullError:
+                shutil.rmtree(piped.directory, ignore_errors=True)
+                raise
+            if stream_name is not None:
+                _track_stream(job, stream_name)
+            # The job already holds a worker, so every way the feed can end
+            # early cancels it; feed() makes sure the worker is not left waiting.
+            try:
+                await piped.feed(request.stream())
+            except UploadTooLarge as e:
+                job_queue.cancel(job, str(e))
+                return _too_large_response(e, job)
+            except OSError as e:
+                job_queue.cancel(job, f"Upload could not be handed to a worker: {e}")
+                return JSONResponse(
+                    status_code=503,
+                    content={"error": "No worker took the upload, try again later", "job_id": job.job_id},
+                    headers={"Retry-After": "5"},
+                )
+            except BaseException:
+                job_queue.cancel(job, "Upload aborted by the client")
+                raise
+            UPLOAD_BYTES.inc(piped.size)
+        else:
+            upload = await save_chunks(request.stream())
+            UPLOAD_BYTES.inc(upload.size)
+            try:
+                job = job_queue.submit(
+                    kind, upload.path, BASE_URL, render=render or hls, digest=upload.digest, profile=profile,
+                    output_filename=stream_name,
+                )
+            except QueueFullError:
+                os.remove(upload.path)
+                raise
+            if stream_name is not None:
+                _track_stream(job, stream_name)
+    except (QueueFullError, UploadTooLarge) as e:
+        if stream_name is not None and stream_name not in _live_streams:
+            shutil.rmtree(os.path.join(PROCESSED_DIR, stream_name), ignore_errors=True)
+        if isinstance(e, QueueFullError):
+            return _queue_full_response(e)
+        return _too_large_response(e)
+    return _accepted(job, stream_name)
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return job_queue.status(job)
+
+
+# --- API Prediction Endpoints ---
+# These wait for the job to finish, but on the worker pool so the event loop stays free.
+async def _predict(kind: str, file: UploadFile, render: bool, profile: bool):
+    try:
+        job = await _submit(kind, file, render, profile)
+    except QueueFullError as e:
+        return _queue_full_response(e)
+    except UploadTooLarge as e:
+        return _too_large_response(e)
+    try:
+        await asyncio.wrap_future(job.future)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e) or type(e).__name__})
+    return job.result
+
+
 @app.post("/predict_situp")
-async def predict_situp(file: UploadFile = File(...)):
-    base_url = "http://10.223.35.72:8000/"
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
-        tmp.write(await file.read())
-        tmp_path = tmp.name
-    result = process_video_with_counter(tmp_path, SitupCounter(), base_url)
-    os.remove(tmp_path)
-    return result
+async def predict_situp(file: UploadFile = File(...), render: bool = Query(True), profile: bool = Query(False)):
+    return await _predict("situp", file, render, profile)
 
 @app.post("/predict_jump")
-async def predict_jump(file: UploadFile = File(...)):
-    base_url = "http://10.223.35.72:8000/"
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
-        tmp.write(await file.read())
-        tmp_path = tmp.name
-    result = process_video_with_counter(tmp_path, JumpCounter(), base_url)
-    os.remove(tmp_path)
-    return result
+async def predict_jump(file: UploadFile = File(...), render: bool = Query(True), profile: bool = Query(False)):
+    return await _predict("jump", file, render, profile)
+
+
+# --- Landmark-only Endpoint ---
+# For clients that run pose estimation on the device. The body is a packed
+# float32 landmark batch (see landmarks.py), a few hundred KB for a whole set
+# instead of the video, and only the rep logic runs here.
+@app.post("/analyze_landmarks")
+async def analyze_landmarks(
+    request: Request,
+    kind: str = Query("situp", pattern="^(situp|jump)$"),
+    frame_height: int = Query(720, gt=0),
+):
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > MAX_LANDMARK_BYTES:
+        return _too_large_response(UploadTooLarge(MAX_LANDMARK_BYTES))
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_LANDMARK_BYTES:
+            return _too_large_response(UploadTooLarge(MAX_LANDMARK_BYTES))
+    import landmarks
+    import rep_analysis
+    try:
+        batch = landmarks.from_bytes(bytes(body))
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    info = await asyncio.to_thread(rep_analysis.analyze, kind, batch, frame_height)
+    info["frames"] = len(batch)
+    return info
+
+
+@app.get("/landmark_cache/stats")
+def landmark_cache_stats():
+    # Lookups, stores and evictions happen in the workers, so only the disk
+    # usage comes from this process; hits and misses are counted from jobs.
+    from landmark_cache import get_cache
+    stats = get_cache().stats()
+    stats.pop("stores", None)
+    stats.pop("evictions", None)
+    stats["hits"] = job_queue.cache_outcomes["hit"]
+    stats["misses"] = job_queue.cache_outcomes["miss"]
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else None
+    return stats
+
+
+# Prometheus scrape target. Frame-level metrics come from the job workers and
+# are merged in as each job finishes.
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Quality tier new jobs get under the current load (see quality.py). Each
+# result records the tier that produced it under "quality".
+@app.get("/quality/stats")
+def quality_stats():
+    return job_queue.quality.stats()
+
+
+@app.get("/video_store/stats")
+def video_store_stats():
+    return video_store.stats()
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "ready": startup.ready, "queue_depth": job_queue.queue_depth}
+
+
+# Liveness: the process serves HTTP. Readiness: every job worker has built its
+# Pose engines and run an inference; 503 until then (or if that failed).
+@app.get("/livez")
+def livez():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    return JSONResponse(status_code=200 if startup.ready else 503, content=startup.status())
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,53 @@
+# startup.py
+# Startup phases and readiness of the API processes.
+#
+# A replica should answer liveness probes as soon as it serves HTTP, but only
+# report ready once its Pose engines are built and have run an inference, so
+# a load balancer never routes the first users to a cold graph. Each phase of
+# the startup (imports, engine construction, warm-up inference) is timed and
+# logged so import and init costs can be tracked across releases.
+
+import time
+from contextlib import contextmanager
+
+
+class Startup:
+    def __init__(self, name: str, started_at=None) -> None:
+        self.name = name
+        # perf_counter() taken at the top of the server module, if given.
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.phases = {}
+        self.details = {}
+        self.ready = False
+        self.error = None
+        self.ready_after_s = None
+
+    def record(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = round(seconds, 3)
+        print(f"{self.name} startup: {phase} took {1000.0 * seconds:.0f} ms")
+
+    @contextmanager
+    def phase(self, phase: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - t0)
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        self.ready_after_s = round(time.perf_counter() - self.started_at, 3)
+        print(f"{self.name} startup: ready after {1000.0 * self.ready_after_s:.0f} ms")
+
+    def fail(self, e: Exception) -> None:
+        self.error = str(e) or type(e).__name__
+        print(f"{self.name} startup failed: {self.error}")
+
+    def status(self) -> dict:
+        status = "ready" if self.ready else ("failed" if self.error else "starting")
+        info = {"status": status, "phases": dict(self.phases), "ready_after_s": self.ready_after_s}
+        if self.details:
+            info.update(self.details)
+        if self.error:
+            info["error"] = self.error
+        return info
@@ -0,0 +1,11 @@
+# tests/conftest.py
+# The app's modules are flat and imported from the fitness_app directory, as
+# the servers and the benchmarks do. Run from there:
+#   python -m pytest tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import env_setup  # noqa: E402,F401
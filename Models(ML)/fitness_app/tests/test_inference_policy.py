@@ -0,0 +1,66 @@
+# tests/test_inference_policy.py
+# Frame stride and cache signature of inference policies.
+
+import pytest
+
+from inference_policy import FULL_POLICY, InferencePolicy
+
+
+class _Counter:
+    def __init__(self, near: bool) -> None:
+        self.near = near
+
+    def near_transition(self) -> bool:
+        return self.near
+
+
+@pytest.mark.parametrize("target_fps, source_fps, expected", [
+    (None, 60, 1),
+    (15, 60, 4),
+    (15, 30, 2),
+    (12, 30, 2),
+    (10, 30, 3),
+    (15, 25, 2),
+    (30, 30, 1),
+    (30, 24, 1),
+    (15, 0, 1),
+])
+def test_stride(target_fps, source_fps, expected):
+    assert InferencePolicy(target_fps=target_fps).stride(source_fps) == expected
+
+
+def test_adaptive_stride_near_transitions():
+    policy = InferencePolicy(target_fps=15, adaptive=True)
+    assert policy.stride(60) == 4
+    assert policy.stride(60, _Counter(near=False)) == 4
+    assert policy.stride(60, _Counter(near=True)) == 1
+    # Fixed policies ignore the counter.
+    assert InferencePolicy(target_fps=15).stride(60, _Counter(near=True)) == 4
+
+
+def test_signature():
+    assert FULL_POLICY.signature() == "fps=all,dim=src,adaptive=0"
+    assert InferencePolicy(15, 640, True).signature() == "fps=15.0,dim=640,adaptive=1"
+    # Strings from the environment give the same signature as numbers.
+    assert InferencePolicy("15", "640").signature() == InferencePolicy(15.0, 640).signature()
+
+
+def test_signature_separates_models():
+    signatures = {InferencePolicy(model_complexity=c).signature() for c in (0, 1, 2)}
+    assert len(signatures) == 3
+    assert InferencePolicy(model_complexity=1).signature() == FULL_POLICY.signature()
+
+
+def test_is_full():
+    assert FULL_POLICY.is_full
+    assert InferencePolicy(adaptive=True).is_full
+    assert not InferencePolicy(target_fps=15).is_full
+    assert not InferencePolicy(max_dim=640).is_full
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("INFER_TARGET_FPS", "15")
+    monkeypatch.setenv("INFER_MAX_DIM", "")
+    monkeypatch.setenv("INFER_ADAPTIVE", "true")
+    policy = InferencePolicy.from_env()
+    assert policy.to_dict() == {"target_fps": 15.0, "max_dim": None, "adaptive": True, "model_complexity": 1}
@@ -0,0 +1,83 @@
+# tests/test_landmark_cache.py
+# Cache keys, storage round trip and LRU eviction of the landmark cache.
+
+import os
+
+import numpy as np
+
+from inference_policy import FULL_POLICY, InferencePolicy
+from landmark_cache import LandmarkCache
+
+DIGEST = "ab" * 32
+META = {"frame_height": 720, "frame_width": 1280, "fps": 30.0, "frames": 10}
+
+
+def _put(cache, key, frames=10):
+    landmarks = np.full((frames, 33, 4), 0.5, dtype=np.float32)
+    cache.put(key, landmarks, np.arange(frames), META)
+    return landmarks
+
+
+def _age(cache, key, mtime):
+    os.utime(cache._path(key, ".npy"), (mtime, mtime))
+
+
+def test_key():
+    key = LandmarkCache.key(DIGEST, FULL_POLICY, "situp")
+    assert key.startswith(DIGEST + "-")
+    assert key == LandmarkCache.key(DIGEST, InferencePolicy(), "situp")
+    # Fixed policies analyse the same frames for every exercise.
+    assert key == LandmarkCache.key(DIGEST, FULL_POLICY, "jump")
+    assert key != LandmarkCache.key("cd" * 32, FULL_POLICY, "situp")
+    assert key != LandmarkCache.key(DIGEST, InferencePolicy(target_fps=15), "situp")
+    assert key != LandmarkCache.key(DIGEST, InferencePolicy(max_dim=640), "situp")
+    assert key != LandmarkCache.key(DIGEST, InferencePolicy(model_complexity=0), "situp")
+    adaptive = InferencePolicy(target_fps=15, adaptive=True)
+    assert LandmarkCache.key(DIGEST, adaptive, "situp") != LandmarkCache.key(DIGEST, adaptive, "jump")
+
+
+def test_round_trip(tmp_path):
+    cache = LandmarkCache(str(tmp_path))
+    assert cache.get("missing") is None
+    landmarks = _put(cache, "k")
+    hit = cache.get("k")
+    np.testing.assert_array_equal(hit.landmarks, landmarks)
+    np.testing.assert_array_equal(hit.frame_index, np.arange(10))
+    assert (hit.frame_height, hit.frame_width, hit.fps, hit.frames) == (720, 1280, 30.0, 10)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stores"], stats["entries"]) == (1, 1, 1, 1)
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".")]
+
+
+def test_entry_without_metadata_is_a_miss(tmp_path):
+    cache = LandmarkCache(str(tmp_path))
+    _put(cache, "k")
+    os.remove(cache._path("k", ".json"))
+    assert cache.get("k") is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = LandmarkCache(str(tmp_path))
+    _put(cache, "a")
+    entry_bytes = cache.stats()["bytes"]
+    cache.max_bytes = 3 * entry_bytes
+    _put(cache, "b")
+    _put(cache, "c")
+    for age, key in enumerate(("c", "b", "a")):
+        _age(cache, key, 1_000_000 + age)
+    # A hit makes "c", the oldest entry, the most recently used one.
+    assert cache.get("c") is not None
+    _put(cache, "d")
+    assert cache.get("b") is None
+    for key in ("a", "c", "d"):
+        assert cache.get(key) is not None
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"]) == (3, 1)
+    assert stats["bytes"] <= cache.max_bytes
+
+
+def test_evicts_everything_over_a_zero_cap(tmp_path):
+    cache = LandmarkCache(str(tmp_path), max_bytes=0)
+    _put(cache, "a")
+    assert cache.stats()["entries"] == 0
+    assert os.listdir(tmp_path) == []
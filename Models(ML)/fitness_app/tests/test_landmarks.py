@@ -0,0 +1,53 @@
+# tests/test_landmarks.py
+# Wire format of landmark batches (/analyze_landmarks, the landmark cache).
+
+import numpy as np
+import pytest
+
+import landmarks
+
+
+def _trace(frames, seed=0):
+    rng = np.random.default_rng(seed)
+    trace = rng.uniform(0, 1, (frames, landmarks.NUM_LANDMARKS, landmarks.NUM_FIELDS)).astype(np.float32)
+    trace[rng.uniform(0, 1, frames) < 0.1] = np.nan
+    return trace
+
+
+def test_round_trip():
+    trace = _trace(120, seed=3)
+    data = landmarks.to_bytes(trace)
+    assert len(data) == 120 * landmarks.FRAME_BYTES
+    back = landmarks.from_bytes(data)
+    assert back.dtype == np.float32
+    assert back.shape == trace.shape
+    np.testing.assert_array_equal(back, trace)
+
+
+def test_little_endian_on_the_wire():
+    batch = np.zeros((1, landmarks.NUM_LANDMARKS, landmarks.NUM_FIELDS), dtype=np.float32)
+    batch[0, 0, 0] = 1.0
+    assert landmarks.to_bytes(batch)[:4] == b"\x00\x00\x80\x3f"
+    # Big-endian or float64 input is converted, not copied byte for byte.
+    np.testing.assert_array_equal(landmarks.from_bytes(landmarks.to_bytes(batch.astype(">f8"))), batch)
+
+
+def test_any_nan_drops_the_whole_frame():
+    batch = np.ones((3, landmarks.NUM_LANDMARKS, landmarks.NUM_FIELDS), dtype=np.float32)
+    batch[1, 5, 2] = np.nan
+    back = landmarks.from_bytes(landmarks.to_bytes(batch))
+    assert landmarks.valid_mask(back).tolist() == [True, False, True]
+    assert np.isnan(back[1]).all()
+    np.testing.assert_array_equal(back[[0, 2]], batch[[0, 2]])
+
+
+def test_result_is_writable():
+    # np.frombuffer alone would be a read-only view of the request body.
+    back = landmarks.from_bytes(landmarks.to_bytes(_trace(2)))
+    back[0, 0, 0] = 0.5
+
+
+@pytest.mark.parametrize("size", [0, 1, landmarks.FRAME_BYTES - 1, landmarks.FRAME_BYTES + 4])
+def test_rejects_partial_frames(size):
+    with pytest.raises(ValueError):
+        landmarks.from_bytes(b"\x00" * size)
@@ -0,0 +1,60 @@
+# tests/test_rep_analysis.py
+# The vectorized rep logic must give what the streaming counters give when
+# fed the same landmarks frame by frame.
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("mediapipe")
+
+import numpy as np  # noqa: E402
+
+import rep_analysis  # noqa: E402
+from benchmarks.synthetic import synthetic_trace  # noqa: E402
+from counters import COUNTERS  # noqa: E402
+
+FRAME_HEIGHT = 720
+
+
+def _streaming(kind, trace, frame_step=1):
+    counter = COUNTERS[kind]()
+    counter.set_frame_step(frame_step)
+    info = {}
+    try:
+        for row in trace:
+            info = counter.update_landmarks(row, (FRAME_HEIGHT,))
+    finally:
+        counter.close()
+    return info
+
+
+@pytest.mark.parametrize("kind", ["situp", "jump"])
+@pytest.mark.parametrize("seed", range(12))
+def test_batch_matches_streaming(kind, seed):
+    # Lengths vary so traces also end mid-rep.
+    frames = 200 + int(np.random.default_rng(seed).integers(0, 700))
+    trace = synthetic_trace(kind, frames, seed)
+    info = rep_analysis.analyze(kind, trace, FRAME_HEIGHT)
+    assert info == _streaming(kind, trace)
+    if frames >= 400:
+        assert info["count"] > 0
+
+
+@pytest.mark.parametrize("frame_step", [2, 3, 5])
+@pytest.mark.parametrize("seed", range(6))
+def test_jump_batch_matches_streaming_with_frame_step(seed, frame_step):
+    trace = synthetic_trace("jump", 900, seed)[::frame_step]
+    assert rep_analysis.analyze("jump", trace, FRAME_HEIGHT, frame_step) == _streaming("jump", trace, frame_step)
+
+
+def test_all_dropped_frames():
+    trace = np.full((50, 33, 4), np.nan, dtype=np.float32)
+    for kind in ("situp", "jump"):
+        info = rep_analysis.analyze(kind, trace, FRAME_HEIGHT)
+        assert info == _streaming(kind, trace)
+        assert info["count"] == 0
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        rep_analysis.analyze("pushup", synthetic_trace("situp", 10), FRAME_HEIGHT)
@@ -0,0 +1,44 @@
+# tests/test_segments.py
+# How long uploads are cut into segments.
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("mediapipe")
+
+import segments  # noqa: E402
+
+
+@pytest.mark.parametrize("total_frames", [1, 2, 7, 100, 1801, 54000])
+@pytest.mark.parametrize("workers", [1, 2, 3, 8])
+def test_plan_covers_every_frame_once(total_frames, workers):
+    spans = segments.plan(total_frames, workers)
+    assert len(spans) == min(workers, total_frames)
+    assert spans[0][0] == 0
+    assert spans[-1][1] is None
+    for (_, end), (start, _) in zip(spans, spans[1:]):
+        assert end == start
+    ends = [end for _, end in spans[:-1]] + [total_frames]
+    sizes = [end - start for (start, _), end in zip(spans, ends)]
+    assert all(size > 0 for size in sizes)
+    assert max(sizes) - min(sizes) <= 1
+
+
+def test_plan_clamps_the_segment_count():
+    assert segments.plan(10, 0) == [(0, None)]
+    assert segments.plan(3, 5) == [(0, 1), (1, 2), (2, None)]
+    assert segments.plan(0, 4) == [(0, None)]
+
+
+def test_enabled(monkeypatch):
+    from inference_policy import InferencePolicy
+
+    monkeypatch.setattr(segments, "SEGMENT_WORKERS", 4)
+    monkeypatch.setattr(segments, "SEGMENT_MIN_SECONDS", 60)
+    assert segments.enabled(InferencePolicy(), 30, 1800)
+    assert not segments.enabled(InferencePolicy(), 30, 1799)
+    assert not segments.enabled(InferencePolicy(), 0, 1800)
+    # Adaptive sampling needs the counter state of every earlier frame.
+    assert not segments.enabled(InferencePolicy(adaptive=True), 30, 1800)
+    monkeypatch.setattr(segments, "SEGMENT_WORKERS", 1)
+    assert not segments.enabled(InferencePolicy(), 30, 1800)
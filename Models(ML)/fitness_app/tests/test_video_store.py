@@ -0,0 +1,48 @@
+# tests/test_video_store.py
+# Range header parsing of /get_video.
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from video_store import _parse_range  # noqa: E402
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-19", (10, 19)),
+    ("bytes=10-", (10, 99)),
+    ("bytes=99-", (99, 99)),
+    ("bytes=0-1000", (0, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-1000", (0, 99)),
+    ("Bytes = 5-6", (5, 6)),
+])
+def test_satisfiable(header, expected):
+    assert _parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "items=0-10",
+    "bytes=0-1,5-6",
+    "bytes=5",
+    "bytes=-",
+    "bytes=a-b",
+    "bytes=1-x",
+    "bytes=20-10",
+])
+def test_ignored(header):
+    # Ignored ranges are answered with the whole file.
+    assert _parse_range(header, 100) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=100-200", "bytes=500-", "bytes=-0"])
+def test_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        _parse_range(header, 100)
+
+
+@pytest.mark.parametrize("header", ["bytes=0-", "bytes=-10"])
+def test_empty_file(header):
+    with pytest.raises(ValueError):
+        _parse_range(header, 0)
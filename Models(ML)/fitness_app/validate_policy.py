@@ -0,0 +1,89 @@
+# validate_policy.py
+# Checks that an inference policy leaves rep counts unchanged.
+#
+# Every clip is analysed twice in stats-only mode: once on every frame at full
+# resolution, and once with the given policy. The report lists both counts and
+# the share of frames that still needed inference.
+#
+# Usage:
+#   python validate_policy.py clips/*.mp4 --target-fps 15 --max-dim 640 --adaptive
+#   python validate_policy.py clips/ --kind jump --report policy_report.json
+
+import argparse
+import json
+import os
+import sys
+
+import env_setup  # noqa: F401
+from inference_policy import FULL_POLICY, InferencePolicy
+from processing import COUNTERS, process_video_with_counter
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv")
+
+
+def _clips(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def _analyse(path, kind, policy):
+    result = process_video_with_counter(path, COUNTERS[kind](), "", render=False, policy=policy)
+    return result["count"], result["timings"]
+
+
+def validate(paths, kinds, policy):
+    rows = []
+    for path in _clips(paths):
+        for kind in kinds:
+            ref_count, ref_timings = _analyse(path, kind, FULL_POLICY)
+            count, timings = _analyse(path, kind, policy)
+            rows.append({
+                "clip": path,
+                "kind": kind,
+                "reference_count": ref_count,
+                "policy_count": count,
+                "match": ref_count == count,
+                "frames": timings["frames"],
+                "analyzed_frames": timings["analyzed_frames"],
+                "reference_process_s": ref_timings["process_s"],
+                "policy_process_s": timings["process_s"],
+            })
+    return {"policy": policy.to_dict(), "clips": rows, "all_match": all(r["match"] for r in rows)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that an inference policy leaves rep counts unchanged.")
+    parser.add_argument("paths", nargs="+", help="video files or directories of clips")
+    parser.add_argument("--kind", choices=["situp", "jump", "both"], default="both")
+    parser.add_argument("--target-fps", type=float, default=None)
+    parser.add_argument("--max-dim", type=int, default=None)
+    parser.add_argument("--adaptive", action="store_true")
+    parser.add_argument("--report", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    kinds = ["situp", "jump"] if args.kind == "both" else [args.kind]
+    policy = InferencePolicy(args.target_fps, args.max_dim, args.adaptive)
+    report = validate(args.paths, kinds, policy)
+
+    print(f"Policy: {policy.signature()}")
+    for row in report["clips"]:
+        flag = "ok" if row["match"] else "MISMATCH"
+        print(
+            f"{flag:8} {row['kind']:5} {os.path.basename(row['clip'])}: "
+            f"{row['reference_count']} -> {row['policy_count']} reps, "
+            f"{row['analyzed_frames']}/{row['frames']} frames analysed, "
+            f"{row['reference_process_s']:.2f}s -> {row['policy_process_s']:.2f}s"
+        )
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if report["all_match"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
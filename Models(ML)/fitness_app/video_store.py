@@ -0,0 +1,359 @@
+# video_store.py
+# Processed-video storage: an in-memory index, HTTP range/conditional
+# responses and background retention.
+#
+# Overlay videos are written by the job workers into PROCESSED_DIR, and
+# stats-only jobs leave their sources in PENDING_DIR until rendered. The API
+# process keeps an index of both (size, mtime, ETag, last access) so a request
+# costs a dict lookup instead of filesystem probes. Files written by other
+# processes are picked up on first request and by the periodic sweep, which
+# also deletes whatever has not been accessed for VIDEO_TTL_HOURS and then the
+# least recently used files until everything fits in VIDEO_STORE_MAX_MB.
+# Pending sources are full uploads that may never be asked for, so they have
+# their own, tighter bounds (PENDING_TTL_HOURS, PENDING_MAX_MB), applied first.
+# Upload spools left behind by a crash are removed after VIDEO_TTL_HOURS.
+#
+# Video players seek with single byte ranges, so that is what is served as
+# 206; multi-range requests get the whole file, which RFC 9110 allows.
+#
+# Progressive HLS outputs (see hls.py) are directories; they are indexed and
+# evicted as one entry whose size is that of all their files.
+
+import os
+import stat
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from email.utils import formatdate
+
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+import hls
+
+logger = logging.getLogger(__name__)
+
+VIDEO_TTL_SECONDS = float(os.environ.get("VIDEO_TTL_HOURS", 24)) * 3600
+VIDEO_STORE_MAX_BYTES = int(float(os.environ.get("VIDEO_STORE_MAX_MB", 2048)) * 1024 * 1024)
+VIDEO_STORE_SWEEP_SECONDS = float(os.environ.get("VIDEO_STORE_SWEEP_SECONDS", 60))
+PENDING_TTL_SECONDS = float(os.environ.get("PENDING_TTL_HOURS", 6)) * 3600
+PENDING_MAX_BYTES = int(float(os.environ.get("PENDING_MAX_MB", 1024)) * 1024 * 1024)
+STREAM_CHUNK = 256 * 1024
+
+
+class Entry:
+    def __init__(self, path, stat_result, pending: bool = False, size=None) -> None:
+        self.path = path
+        self.stat_result = stat_result
+        self.size = stat_result.st_size if size is None else size
+        self.mtime = stat_result.st_mtime
+        self.pending = pending
+        self.last_access = self.mtime
+        tag = f"{os.path.basename(path)}-{self.size}-{self.mtime}"
+        self.etag = '"%s"' % hashlib.md5(tag.encode()).hexdigest()
+        self.last_modified = formatdate(self.mtime, usegmt=True)
+
+
+def _parse_range(header: str, size: int):
+    """(start, end) inclusive for a single "bytes=" range, None to ignore it.
+
+    Raises ValueError if the range cannot be satisfied.
+    """
+    units, _, spec = header.partition("=")
+    if units.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start = max(0, size - int(last))
+            end = size - 1
+    except ValueError:
+        return None
+    # Checked first: "bytes=100-" of a 100-byte file has end < start but is a 416.
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    if start > end or start < 0:
+        return None
+    return start, min(end, size - 1)
+
+
+def _tree_size(path) -> int:
+    total = 0
+    with os.scandir(path) as it:
+        for e in it:
+            if e.is_file():
+                total += e.stat().st_size
+    return total
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class VideoStore:
+    def __init__(self, directory, pending_dir, ttl: float = VIDEO_TTL_SECONDS, max_bytes: int = VIDEO_STORE_MAX_BYTES,
+                 in_use=None, pending_ttl: float = PENDING_TTL_SECONDS, pending_max_bytes: int = PENDING_MAX_BYTES,
+                 upload_dir=None) -> None:
+        self.directory = directory
+        self.pending_dir = pending_dir
+        self.upload_dir = upload_dir
+        self.ttl = float(ttl)
+        self.max_bytes = int(max_bytes)
+        self.pending_ttl = float(pending_ttl)
+        self.pending_max_bytes = int(pending_max_bytes)
+        # Names that must not be evicted right now, e.g. pending renders.
+        self.in_use = in_use or (lambda name: False)
+        self._videos = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.evictions = 0
+        os.makedirs(pending_dir, exist_ok=True)
+
+    # --- Index ---
+    @staticmethod
+    def _stat(path, pending=False):
+        # Files are videos; directories only count as HLS streams.
+        try:
+            stat_result = os.stat(path)
+            if not stat.S_ISDIR(stat_result.st_mode):
+                return None if hls.is_stream(path) else Entry(path, stat_result, pending)
+            if pending or not hls.is_stream(path):
+                return None
+            return Entry(path, stat_result, size=_tree_size(path))
+        except OSError:
+            return None
+
+    def _index_for(self, pending: bool):
+        return self._pending if pending else self._videos
+
+    def _lookup(self, name: str, pending: bool):
+        # Hidden names are partial writes (".rendering-*") or metadata.
+        if not name or name.startswith(".") or os.sep in name or name.endswith(".json"):
+            return None
+        index = self._index_for(pending)
+        with self._lock:
+            entry = index.get(name)
+        if entry is None:
+            directory = self.pending_dir if pending else self.directory
+            entry = self._stat(os.path.join(directory, name), pending)
+            if entry is not None:
+                with self._lock:
+                    entry = index.setdefault(name, entry)
+        return entry
+
+    def get(self, name: str):
+        """Index entry of a processed video, or None."""
+        return None if hls.is_stream(name) else self._lookup(name, pending=False)
+
+    def get_stream(self, name: str):
+        """Index entry of a progressive HLS output directory, or None."""
+        return self._lookup(name, pending=False) if hls.is_stream(name) else None
+
+    def is_pending(self, name: str) -> bool:
+        """Whether a stats-only job left a source to render `name` from."""
+        return self._lookup(name, pending=True) is not None
+
+    def add(self, name: str):
+        """Index a video that was just written; returns its entry."""
+        entry = self._stat(os.path.join(self.directory, name))
+        with self._lock:
+            if entry is None:
+                self._videos.pop(name, None)
+            else:
+                self._videos[name] = entry
+            # A rendered video replaces its pending source.
+            self._pending.pop(name, None)
+        return entry
+
+    def scan(self) -> None:
+        """Rebuild the index from disk, keeping known access times."""
+        found = {}
+        for pending, directory in ((False, self.directory), (True, self.pending_dir)):
+            found[pending] = {}
+            with os.scandir(directory) as it:
+                for e in it:
+                    if e.name.startswith(".") or e.name.endswith(".json"):
+                        continue
+                    entry = self._stat(e.path, pending)
+                    if entry is not None:
+                        found[pending][e.name] = entry
+        with self._lock:
+            for pending, entries in found.items():
+                index = self._index_for(pending)
+                for name, entry in entries.items():
+                    known = index.get(name)
+                    if known is not None and known.mtime == entry.mtime:
+                        entry.last_access = known.last_access
+                index.clear()
+                index.update(entries)
+
+    # --- Retention ---
+    def _delete(self, name: str, entry: Entry) -> None:
+        paths = [entry.path] + ([entry.path + ".json"] if entry.pending else [])
+        if hls.is_stream(name):
+            shutil.rmtree(entry.path, ignore_errors=True)
+            paths = []
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._index_for(entry.pending).pop(name, None)
+        self.evictions += 1
+
+    def _evict(self, entries, ttl: float, max_bytes: int, now: float) -> int:
+        # Oldest access first, until the rest is both fresh and within max_bytes.
+        entries = sorted([(n, e) for n, e in entries if not self.in_use(n)], key=lambda item: item[1].last_access)
+        total = sum(e.size for _, e in entries)
+        evicted = 0
+        for name, entry in entries:
+            if now - entry.last_access <= ttl and total <= max_bytes:
+                break
+            self._delete(name, entry)
+            total -= entry.size
+            evicted += 1
+        return evicted
+
+    def _remove_stale_uploads(self, now: float) -> None:
+        if not self.upload_dir or not os.path.isdir(self.upload_dir):
+            return
+        with os.scandir(self.upload_dir) as it:
+            for e in it:
+                try:
+                    if now - e.stat(follow_symlinks=False).st_mtime <= self.ttl:
+                        continue
+                    if e.is_dir(follow_symlinks=False):
+                        shutil.rmtree(e.path, ignore_errors=True)
+                    else:
+                        os.remove(e.path)
+                except OSError:
+                    pass
+
+    def sweep(self, now=None) -> int:
+        """Delete expired files, then least recently used ones over the size caps."""
+        self.scan()
+        now = time.time() if now is None else now
+        self._remove_stale_uploads(now)
+        with self._lock:
+            pending = list(self._pending.items())
+        evicted = self._evict(pending, self.pending_ttl, self.pending_max_bytes, now)
+        with self._lock:
+            entries = list(self._videos.items()) + list(self._pending.items())
+        evicted += self._evict(entries, self.ttl, self.max_bytes, now)
+        total = self.stats()["bytes"]
+        if evicted:
+            logger.info("Video store: evicted %d file(s), %.1f MB kept.", evicted, total / (1024 * 1024))
+        return evicted
+
+    def _run(self) -> None:
+        while not self._stop.wait(VIDEO_STORE_SWEEP_SECONDS):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.warning("Video store sweep failed: %s", e)
+
+    def start(self) -> None:
+        self.sweep()
+        self._thread = threading.Thread(target=self._run, name="video-store-sweeper", daemon=True)
+        self._thread.start()
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            videos = list(self._videos.values())
+            pending = list(self._pending.values())
+        return {
+            "videos": len(videos),
+            "pending": len(pending),
+            "bytes": sum(e.size for e in videos) + sum(e.size for e in pending),
+            "pending_bytes": sum(e.size for e in pending),
+            "max_bytes": self.max_bytes,
+            "pending_max_bytes": self.pending_max_bytes,
+            "ttl_s": self.ttl,
+            "pending_ttl_s": self.pending_ttl,
+            "evictions": self.evictions,
+        }
+
+    # --- HTTP ---
+    def response(self, entry: Entry, headers, media_type: str = "video/mp4", head: bool = False,
+                 cache_control: str = "private, max-age=3600"):
+        """200, 206, 304 or 416 response for a GET/HEAD of `entry`."""
+        entry.last_access = time.time()
+        common = {
+            "accept-ranges": "bytes",
+            "etag": entry.etag,
+            "last-modified": entry.last_modified,
+            "cache-control": cache_control,
+        }
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None and _etag_matches(if_none_match, entry.etag):
+            return Response(status_code=304, headers=common)
+
+        byte_range = None
+        range_header = headers.get("range")
+        if_range = headers.get("if-range")
+        if range_header and (if_range is None or if_range in (entry.etag, entry.last_modified)):
+            try:
+                byte_range = _parse_range(range_header, entry.size)
+            except ValueError:
+                return Response(status_code=416, headers={**common, "content-range": f"bytes */{entry.size}"})
+
+        if byte_range is None:
+            if head:
+                return Response(headers={**common, "content-length": str(entry.size)}, media_type=media_type)
+            return FileResponse(entry.path, media_type=media_type, headers=common, stat_result=entry.stat_result)
+
+        start, end = byte_range
+        length = end - start + 1
+        range_headers = {**common, "content-range": f"bytes {start}-{end}/{entry.size}", "content-length": str(length)}
+        if head:
+            return Response(status_code=206, headers=range_headers, media_type=media_type)
+        return StreamingResponse(
+            _read_range(entry.path, start, length), status_code=206, headers=range_headers, media_type=media_type,
+        )
+
+
+    def stream_response(self, entry: Entry, file_name: str, headers, head: bool = False):
+        """Response for the playlist or a segment of an HLS stream, None if there is no such file."""
+        if file_name == hls.PLAYLIST:
+            # Still growing while the job runs: players must revalidate every reload.
+            media_type, cache_control = hls.PLAYLIST_MEDIA_TYPE, "no-cache"
+        elif file_name.endswith(".ts") and not file_name.startswith(".") and os.sep not in file_name:
+            media_type, cache_control = hls.SEGMENT_MEDIA_TYPE, "private, max-age=3600"
+        else:
+            return None
+        part = self._stat(os.path.join(entry.path, file_name))
+        if part is None:
+            return None
+        entry.last_access = time.time()
+        return self.response(part, headers, media_type, head, cache_control)
+
+
+async def _read_range(path, start: int, length: int):
+    f = await run_in_threadpool(open, path, "rb")
+    try:
+        await run_in_threadpool(f.seek, start)
+        while length > 0:
+            chunk = await run_in_threadpool(f.read, min(STREAM_CHUNK, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        await run_in_threadpool(f.close)
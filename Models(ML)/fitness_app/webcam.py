@@ -0,0 +1,178 @@
+# webcam.py
+# Local webcam pipeline for the Streamlit app.
+#
+# Three rates are decoupled. A capture thread reads the camera at its own
+# pace and keeps only the newest frame, so nothing piles up in the camera
+# buffer. A processing thread analyses the newest frame whenever it is free,
+# and frames that arrived in the meantime are dropped. The UI redraws at most
+# WEBCAM_UI_FPS times a second with the newest result.
+#
+# The WebcamSession lives in st.session_state, so Streamlit reruns reuse the
+# open camera and the counter with its warm Pose graph. A session that nobody
+# has polled for WEBCAM_IDLE_TIMEOUT_S (e.g. the browser tab was closed)
+# shuts itself down and releases the camera.
+
+import os
+import time
+import threading
+from collections import deque
+
+import cv2
+
+from counters import COUNTERS
+
+WEBCAM_UI_FPS = float(os.environ.get("WEBCAM_UI_FPS", 15))
+WEBCAM_IDLE_TIMEOUT_S = float(os.environ.get("WEBCAM_IDLE_TIMEOUT_S", 10))
+# Completion times kept for the rolling fps readouts.
+RATE_WINDOW = 30
+
+
+def _rate(times):
+    if len(times) < 2 or times[-1] <= times[0]:
+        return None
+    return (len(times) - 1) / (times[-1] - times[0])
+
+
+class LatestFrame:
+    """Single slot holding the newest item, numbered so readers can wait for a newer one."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._item = None
+        self.seq = 0
+
+    def put(self, item) -> None:
+        with self._cond:
+            self._item = item
+            self.seq += 1
+            self._cond.notify_all()
+
+    def get(self, after: int, timeout: float):
+        """(seq, item) once an item newer than `after` exists, or (after, None) on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.seq > after, timeout):
+                return after, None
+            return self.seq, self._item
+
+
+class CameraCapture:
+    def __init__(self, index: int = 0) -> None:
+        self.index = index
+        self.frames = LatestFrame()
+        self.error = None
+        self._times = deque(maxlen=RATE_WINDOW)
+        self._cap = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._cap = cv2.VideoCapture(self.index)
+        if not self._cap.isOpened():
+            self._cap.release()
+            raise RuntimeError(f"Could not open webcam {self.index}. Try another index.")
+        self._thread = threading.Thread(target=self._run, name="webcam-capture", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            ok, frame = self._cap.read()
+            if not ok:
+                self.error = "Webcam frame not read. Stopping."
+                self.frames.put(None)
+                return
+            now = time.perf_counter()
+            self._times.append(now)
+            self.frames.put((frame, now))
+
+    @property
+    def fps(self):
+        return _rate(list(self._times))
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class WebcamSession:
+    def __init__(self, kind: str, index: int = 0, idle_timeout: float = WEBCAM_IDLE_TIMEOUT_S) -> None:
+        self.kind = kind
+        self.camera = CameraCapture(index)
+        self.counter = COUNTERS[kind]()
+        self.results = LatestFrame()
+        self.idle_timeout = float(idle_timeout)
+        self.error = None
+        self.dropped = 0
+        self.latency_ms = None
+        self._times = deque(maxlen=RATE_WINDOW)
+        self._polled_at = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        try:
+            self.camera.start()
+        except RuntimeError:
+            self.counter.close()
+            raise
+        self._thread = threading.Thread(target=self._run, name="webcam-processing", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        # This thread owns the camera and the counter, so it also releases them.
+        seen = 0
+        try:
+            while not self._stop.is_set():
+                if time.perf_counter() - self._polled_at > self.idle_timeout:
+                    print("Webcam session idle, stopping.")
+                    return
+                seq, item = self.camera.frames.get(seen, timeout=0.5)
+                if seq == seen:
+                    continue
+                if item is None:
+                    self.error = self.camera.error
+                    return
+                self.dropped += seq - seen - 1
+                # Frames dropped in between still passed in time, so the
+                # counter's frame-counted thresholds must span them too.
+                self.counter.set_frame_step(seq - seen)
+                seen = seq
+                frame, captured_at = item
+                # Each captured frame is a new array that only this thread reads, so draw on it in place.
+                output, info = self.counter.process_frame(frame, out=frame)
+                done = time.perf_counter()
+                self._times.append(done)
+                self.latency_ms = 1000.0 * (done - captured_at)
+                self.results.put((output, info))
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+        finally:
+            self.camera.stop()
+            self.counter.close()
+
+    def poll(self, after: int, timeout: float):
+        """Newest (seq, (frame, info)) after `after`; see LatestFrame.get."""
+        self._polled_at = time.perf_counter()
+        return self.results.get(after, timeout)
+
+    def stats(self) -> dict:
+        return {
+            "processing_fps": _rate(list(self._times)),
+            "camera_fps": self.camera.fps,
+            "latency_ms": self.latency_ms,
+            "dropped": self.dropped,
+        }
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -1,10 +1,60 @@
 # websocket_server.py
 
+import time
+STARTED_AT = time.perf_counter()
+
 import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from metrics import REGISTRY
+from startup import Startup
+
+# cv2, mediapipe and the counters are imported by the warm-up below, after the
+# server already answers liveness probes, so the process starts in well under
+# a second. Everything that needs them waits for readiness.
+KINDS = ("situp", "jump")
+startup = Startup("websocket server", STARTED_AT)
+startup.record("import", time.perf_counter() - STARTED_AT)
+
+# One set of Pose workers shared fairly by every live session; built by the warm-up.
+scheduler = None
+REGISTRY.gauge("fitness_live_sessions", "Open live analysis sessions.",
+               fn=lambda: len(scheduler.stats()["sessions"]) if scheduler is not None else 0)
+
+
+def _warm_up() -> None:
+    global scheduler
+    try:
+        with startup.phase("inference_imports"):
+            import env_setup  # noqa: F401
+            import counters  # noqa: F401
+            from scheduler import InferenceScheduler
+        with startup.phase("pose_engines"):
+            instance = InferenceScheduler()
+            instance.start()
+        scheduler = instance
+        with startup.phase("warmup_inference"):
+            healthy = scheduler.warm_up()
+        if not healthy:
+            raise RuntimeError("A Pose engine failed its warm-up inference")
+        startup.mark_ready()
+    except Exception as e:
+        startup.fail(e)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    warm_up = asyncio.create_task(asyncio.to_thread(_warm_up))
+    yield
+    await warm_up
+    if scheduler is not None:
+        await asyncio.to_thread(scheduler.shutdown)
+
 
 # This is our new, simplified FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -35,9 +85,121 @@ async def websocket_endpoint(websocket: WebSocket):
     except WebSocketDisconnect:
         print("Client disconnected.")
 
+@app.websocket("/ws/analyze")
+async def analyze_endpoint(websocket: WebSocket, kind: str = "situp", fps: float = 0):
+    """
+    Real-time pose analysis. The client sends encoded frames (JPEG/PNG) as
+    binary messages and gets one JSON message back per analysed frame with
+    the counter info, the frame's sequence number, how many frames were
+    dropped so far, the receive-to-result latency and the quality tier the
+    frame was analysed at (lighter under load). When inference falls
+    behind, only the newest frame is kept, so latency stays bounded. At most
+    `fps` frames a second are analysed (capped by SESSION_MAX_FPS, which is
+    also the default).
+    """
+    if kind not in KINDS:
+        await websocket.close(code=1008, reason=f"Unknown exercise kind: {kind}")
+        return
+    if not startup.ready:
+        await websocket.close(code=1013, reason="Server warming up, try again shortly")
+        return
+    from live_session import LiveSession
+    await websocket.accept()
+    session = LiveSession(kind, scheduler, max_fps=fps)
+    await session.open()
+    print(f"Live {kind} session started.")
+
+    async def receive_frames():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                session.push(message["bytes"])
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while not receiver.done():
+            result_task = asyncio.create_task(session.next_result())
+            done, _ = await asyncio.wait({receiver, result_task}, return_when=asyncio.FIRST_COMPLETED)
+            if result_task not in done:
+                result_task.cancel()
+                break
+            await websocket.send_json(result_task.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        await session.close()
+        print(f"Live {kind} session ended: {session.processed}/{session.received} frames analysed.")
+
+@app.websocket("/ws/landmarks")
+async def landmarks_endpoint(websocket: WebSocket, kind: str = "situp", frame_height: int = 720):
+    """
+    Rep counting for clients that run pose estimation themselves. Each binary
+    message is a packed float32 landmark batch of one or more frames (see
+    landmarks.py); the reply is the counter info after the last of them plus
+    the number of frames seen so far. No inference runs on the server, so
+    nothing is dropped.
+    """
+    if kind not in KINDS or frame_height <= 0:
+        await websocket.close(code=1008, reason=f"Unknown exercise kind or bad frame height: {kind}, {frame_height}")
+        return
+    if not startup.ready:
+        await websocket.close(code=1013, reason="Server warming up, try again shortly")
+        return
+    import landmarks
+    from counters import COUNTERS
+    await websocket.accept()
+    counter = COUNTERS[kind]()
+    frame_shape = (frame_height,)
+    frames = 0
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                batch = landmarks.from_bytes(message.get("bytes"))
+            except ValueError as e:
+                await websocket.send_json({"error": str(e)})
+                continue
+            for row in batch:
+                info = counter.update_landmarks(row, frame_shape)
+            frames += len(batch)
+            await websocket.send_json({**info, "frames": frames})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        counter.close()
+        print(f"Landmark {kind} session ended after {frames} frames.")
+
+# Per-frame stage latencies of the live sessions, in Prometheus text format.
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Achieved fps and latency per live session; "achieved_fps" under full load
+# is what this node can serve.
+@app.get("/sessions")
+def sessions():
+    if scheduler is None:
+        return JSONResponse(status_code=503, content=startup.status())
+    return scheduler.stats()
+
 @app.get("/health")
 def health():
+    return {"status": "ok", "ready": startup.ready}
+
+# Liveness: the process serves HTTP. Readiness: the scheduler's Pose engines
+# are built and have run an inference; 503 until then (or if that failed).
+@app.get("/livez")
+def livez():
     return {"status": "ok"}
 
+@app.get("/readyz")
+def readyz():
+    return JSONResponse(status_code=200 if startup.ready else 503, content=startup.status())
+
 # To run this server:
 # uvicorn websocket_server:app --host 0.0.0.0 --port 8000
\ No newline at end of file